@@ -0,0 +1,106 @@
+"""Generate synthetic constellations of any size, in the format of the constellation JSON files."""
+
+import numpy as np
+
+from models.gravity import GRAVITATIONAL_CONSTANT
+
+AU = 149_597_871_000  # m
+SOLAR_MASS = 1.989e30  # kg
+SOLAR_RADIUS = 6.957e8  # m
+PARSEC = 3.0857e16  # m
+
+
+def constellation(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    masses: np.ndarray,
+    radii: np.ndarray,
+    types: list[str],
+    time_step: float,
+    tail_length: int,
+) -> dict:
+    """Return a constellation module with the given bodies, scaled to fit a window of about 600 pixels."""
+    extent = np.abs(positions).max()
+    return {
+        "Constellation": {
+            f"Body {index}": {
+                "init_position": positions[index].tolist(),
+                "init_velocity": velocities[index].tolist(),
+                "radius": float(radii[index]),
+                "mass": float(masses[index]),
+                "type": types[index],
+                "tail_length": tail_length,
+            }
+            for index in range(len(masses))
+        },
+        "scale_factor": 300 / extent,
+        "time_step": time_step,
+    }
+
+
+def circular_orbits(radii: np.ndarray, central_mass: float, inclination: float, rng: np.random.Generator):
+    """Return positions and velocities of circular orbits around a central mass, with random phases."""
+    phases = rng.uniform(0, 2 * np.pi, len(radii))
+    inclinations = rng.normal(0, inclination, len(radii))
+    directions = np.stack(
+        [np.cos(phases), np.sin(phases) * np.cos(inclinations), np.sin(phases) * np.sin(inclinations)]
+    )
+    tangents = np.stack([-np.sin(phases), np.cos(phases) * np.cos(inclinations), np.cos(phases) * np.sin(inclinations)])
+    speeds = np.sqrt(GRAVITATIONAL_CONSTANT * central_mass / radii)
+    return (directions * radii).T, (tangents * speeds).T
+
+
+def planetary(bodies: int, seed: int = 0, tail_length: int = 1000) -> dict:
+    """A star with planets on circular orbits between 0.3 and 40 AU with masses from the Moon's to Jupiter's."""
+    rng = np.random.default_rng(seed)
+    radii = AU * np.exp(rng.uniform(np.log(0.3), np.log(40), bodies - 1))
+    positions, velocities = circular_orbits(radii, SOLAR_MASS, np.radians(2), rng)
+    return constellation(
+        np.vstack([np.zeros(3), positions]),
+        np.vstack([np.zeros(3), velocities]),
+        np.concatenate([[SOLAR_MASS], np.exp(rng.uniform(np.log(7e22), np.log(2e27), bodies - 1))]),
+        np.concatenate([[SOLAR_RADIUS], rng.uniform(2e6, 7e7, bodies - 1)]),
+        ["star"] + ["terrestrial dry"] * (bodies - 1),
+        time_step=3600.0,
+        tail_length=tail_length,
+    )
+
+
+def cluster(bodies: int, seed: int = 0, tail_length: int = 1000) -> dict:
+    """A Plummer sphere of equal mass stars with a scale radius of 0.1 parsec, in approximate virial equilibrium."""
+    rng = np.random.default_rng(seed)
+    scale_radius, total_mass = 0.1 * PARSEC, bodies * SOLAR_MASS
+    radii = scale_radius / np.sqrt(rng.uniform(1e-3, 0.99, bodies) ** (-2 / 3) - 1)
+    directions = rng.normal(size=(bodies, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    dispersion = np.sqrt(GRAVITATIONAL_CONSTANT * total_mass / (6 * scale_radius))
+    crossing_time = scale_radius / dispersion
+    return constellation(
+        directions * radii[:, np.newaxis],
+        rng.normal(0, dispersion / np.sqrt(3), (bodies, 3)),
+        np.full(bodies, SOLAR_MASS),
+        np.full(bodies, SOLAR_RADIUS),
+        ["star"] * bodies,
+        time_step=crossing_time / 1000,
+        tail_length=tail_length,
+    )
+
+
+def ring(bodies: int, seed: int = 0, tail_length: int = 1000) -> dict:
+    """A planet of the mass of Saturn with a thin ring of small moons between 1.2 and 2.3 times its radius."""
+    rng = np.random.default_rng(seed)
+    planet_mass, planet_radius = 5.683e26, 5.8232e7
+    radii = planet_radius * rng.uniform(1.2, 2.3, bodies - 1)
+    positions, velocities = circular_orbits(radii, planet_mass, np.radians(0.01), rng)
+    return constellation(
+        np.vstack([np.zeros(3), positions]),
+        np.vstack([np.zeros(3), velocities]),
+        np.concatenate([[planet_mass], np.full(bodies - 1, 1e15)]),
+        np.concatenate([[planet_radius], np.full(bodies - 1, 1e3)]),
+        ["gas giant"] + ["moon"] * (bodies - 1),
+        time_step=60.0,
+        tail_length=tail_length,
+    )
+
+
+GENERATORS = {"planetary": planetary, "cluster": cluster, "ring": ring}
@@ -0,0 +1,162 @@
+"""Orbit sim benchmarks: time the physics, the projection and the rendering of synthetic constellations.
+
+Run from the root of the repository: python -m benchmarks.run
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time as wall_time
+from pathlib import Path
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Render without a window
+
+import numpy as np
+import pygame
+from pygame.math import Vector2
+
+from benchmarks.generators import AU, GENERATORS
+from controllers.camera import Camera
+from controllers.time import Time
+from models.gravity import PairwiseGravity
+from models.barneshut import BarnesHutGravity
+from models.loader import create_body_models, create_constellation
+from sim import create_body_viewers
+from views.projection import History, Projection
+from views.settings import ViewSettings
+
+PAIRWISE_LIMIT = 2000  # Constellations with more bodies use the Barnes–Hut gravity solver
+PROJECTED_POINTS = 10_000_000  # Maximum number of tail points of all bodies together in the projection benchmark
+
+
+def time_physics(constellation_module: dict, min_seconds: float) -> float:
+    """Return the number of time steps per second."""
+    constellation_model = create_constellation(constellation_module, create_body_models(constellation_module))
+    time_step = constellation_module["time_step"]
+    constellation_model.advance(1, time_step)  # The first step also calculates the initial accelerations
+    steps, start = 0, wall_time.perf_counter()
+    while (seconds := wall_time.perf_counter() - start) < min_seconds:
+        constellation_model.advance(1, time_step)
+        steps += 1
+    return steps / seconds
+
+
+def time_projection(bodies: int, points: int, repeats: int = 5) -> float:
+    """Return the time in ns to project one tail point, the best of a number of repeats."""
+    history = History(bodies, points)
+    history.extend(np.random.default_rng(0).normal(0, AU, (bodies, points, 3)))
+    positions = history.last(points)
+    projection = Projection(ViewSettings(None, 1.0, Vector2(640, 360), 20.0, 30.0), 300 / AU)  # type: ignore[arg-type]
+    best = np.inf
+    for _ in range(repeats):
+        start = wall_time.perf_counter()
+        projection.project(positions, positions[0])
+        best = min(best, wall_time.perf_counter() - start)
+    return 1e9 * best / (bodies * points)
+
+
+def time_frames(constellation_module: dict, frames: int, warmup: int) -> float:
+    """Return the median time in ms to draw and display a frame with tails and labels, without the physics."""
+    window = pygame.display.set_mode((1280, 720))
+    font = pygame.font.SysFont("monospace", 15)
+    body_models = create_body_models(constellation_module)
+    constellation_model = create_constellation(constellation_module, body_models)
+    time = Time(constellation_module["time_step"])
+    camera = Camera(window, create_body_viewers(constellation_module, body_models, constellation_model, font), time)
+    camera.toggle_tail()
+    camera.toggle_labels()
+    frame_times = []
+    for _ in range(warmup + frames):
+        constellation_model.advance(1, time.time_step)
+        time.update()
+        start = wall_time.perf_counter()
+        camera.update(time.elapsed_time)
+        pygame.display.update()
+        frame_times.append(wall_time.perf_counter() - start)
+    return 1000 * float(np.median(frame_times[warmup:]))
+
+
+def git_commit() -> str:
+    """Return the current git commit, or an empty string outside a git repository."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: list[dict], previous_results: list[dict]) -> None:
+    """Print the ratio of each benchmark result to the previous result of the same benchmark."""
+    previous = {(result["configuration"], result["bodies"]): result for result in previous_results}
+    for result in results:
+        old = previous.get((result["configuration"], result["bodies"]))
+        if not old:
+            continue
+        ratios = [
+            f"{key} x{result[key] / old[key]:.2f}"
+            for key in ("steps_per_second", "projection_ns_per_point", "frame_ms")
+            if result.get(key) and old.get(key)
+        ]
+        print(f"{result['configuration']:>10} {result['bodies']:>7}: {', '.join(ratios)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the physics, projection and rendering of Orbit sim.")
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000", help="comma separated numbers of bodies")
+    parser.add_argument("--configurations", default=",".join(GENERATORS), help="comma separated configurations")
+    parser.add_argument("--seconds", type=float, default=1.0, help="minimum time to run the physics per benchmark")
+    parser.add_argument("--frames", type=int, default=100, help="number of frames to time per benchmark")
+    parser.add_argument("--max-frame-bodies", type=int, default=1000, help="largest constellation to render")
+    parser.add_argument("--out", type=Path, help="JSON file with the results, by default in benchmarks/results")
+    parser.add_argument("--compare", type=Path, help="JSON file with previous results to compare with")
+    args = parser.parse_args()
+
+    pygame.init()
+    results = []
+    for configuration in args.configurations.split(","):
+        for bodies in map(int, args.sizes.split(",")):
+            constellation_module = GENERATORS[configuration](bodies)
+            constellation_module["gravity"] = (
+                PairwiseGravity.name if bodies <= PAIRWISE_LIMIT else BarnesHutGravity.name
+            )
+            points = min(1000, PROJECTED_POINTS // bodies)
+            result = dict(
+                configuration=configuration,
+                bodies=bodies,
+                gravity=constellation_module["gravity"],
+                steps_per_second=time_physics(constellation_module, args.seconds),
+                projected_points=points,
+                projection_ns_per_point=time_projection(bodies, points),
+            )
+            if bodies <= args.max_frame_bodies:
+                result["frame_ms"] = time_frames(constellation_module, args.frames, warmup=10)
+            print(
+                ", ".join(
+                    f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in result.items()
+                )
+            )
+            results.append(result)
+
+    now = datetime.datetime.now()
+    out = args.out or Path("benchmarks/results") / f"{now:%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    report = dict(
+        date=now.isoformat(timespec="seconds"),
+        commit=git_commit(),
+        python=platform.python_version(),
+        numpy=np.__version__,
+        pygame=pygame.version.ver,
+        platform=platform.platform(),
+        results=results,
+    )
+    out.write_text(json.dumps(report, indent=4))
+    print(f"Results written to {out}")
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text())["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,25 @@
 """Orbit sim camera."""
 
-import threading
+import functools
 from operator import attrgetter
-from typing import Sequence
+from pathlib import Path
+from typing import Callable, Sequence
 
+import numpy as np
 import pygame
 from pygame.math import Vector2
+from pygame.rect import Rect
 from pygame.surface import Surface
-from PIL import Image
 
+from controllers.profiler import Profiler
+from controllers.recorder import Recorder
 from controllers.time import Time
+from models.diagnostics import Diagnostics
+from models.physicalobject import PhysicalObjectModel
+from views.cloud import BodyCloudView
 from views.draw import Drawable
 from views.physicalobject import PhysicalObjectView
+from views.projection import History, Projection
 from views.settings import ViewSettings
 
 
@@ -31,6 +39,11 @@ class Camera:
         window: Surface,
         body_viewers: Sequence[PhysicalObjectView],
         time: Time,
+        dirty_rects: bool = False,
+        recorder: Recorder | None = None,
+        profiler: Profiler | None = None,
+        create_diagnostics: Callable[[], Diagnostics] | None = None,
+        cloud: BodyCloudView | None = None,
     ) -> None:
         self.window = window
         self.body_viewers = body_viewers
@@ -38,10 +51,18 @@ class Camera:
         self.scaled_background_image = self.get_scaled_background_image()
         self.time = time
         self.settings = ViewSettings(body_viewers[0], 1.0, self.initialOffset())
+        self._previous_settings = self.settings.copy()
+        # The tails are relative to the tracked body, so its history must be as long as the longest tail
+        self.history = History(len(body_viewers), max(body.tail_length for body in body_viewers))
         self.font = pygame.font.SysFont("monospace", 18)
-        self.images: list[Image.Image] = []
-        self.images_to_save = 0
-        self.thread: threading.Thread | None = None
+        self.recorder = recorder or Recorder(Path("animated.gif"))
+        self.profiler = profiler or Profiler()
+        self._profile_rows: list[list[str]] = []
+        self.cloud = cloud  # The bodies without a view of their own
+        self.create_diagnostics = create_diagnostics  # None without the velocities of the bodies, as with --process
+        self.diagnostics: Diagnostics | None = None  # Created when first shown, since the potential energy is O(N²)
+        self.dirty_rects = dirty_rects  # Only update the areas of the window that changed
+        self._drawn_rects: list[Rect] | None = None  # Areas drawn over the background in the last frame
 
     def initialOffset(self) -> Vector2:
         """The initial offset for the camera is the center of the window. Panning may change the offset."""
@@ -92,10 +113,35 @@ class Camera:
         "Toogle the tail of the bodies"
         self.settings.tail = not self.settings.tail
 
+    def clear_tails(self) -> None:
+        """Clear the tails of the bodies, for example after jumping to another time."""
+        self.history.clear()
+        for body in self.body_viewers:
+            body.clear_tail()
+
+    def remove_bodies(self, body_models: Sequence[PhysicalObjectModel]) -> None:
+        """Remove the views of the bodies, for example after they merged into other bodies, but keep the tails."""
+        keep = [body.body_model not in body_models for body in self.body_viewers]
+        self.history.select(np.flatnonzero(keep))
+        self.body_viewers = [body for body, kept in zip(self.body_viewers, keep) if kept]
+        if self.settings.bodyToTrack not in self.body_viewers:
+            self.reset_BodyToTrack()
+
+    def tails(self) -> np.ndarray:
+        """Return the positions in the tail history of the bodies, to save in a checkpoint."""
+        return self.history.last(len(self.history))
+
+    def restore_tails(self, tails: np.ndarray) -> None:
+        """Restore the tail history of the bodies from a checkpoint, if it has the same bodies."""
+        if len(tails) == len(self.body_viewers):
+            self.history.clear()
+            self.history.extend(tails)
+
     def resize(self) -> None:
         """The window was resized by the user."""
         self.scaled_background_image = self.get_scaled_background_image()
         self.settings.offset = self.initialOffset()
+        self._drawn_rects = None
 
     def get_scaled_background_image(self) -> Surface:
         """Return the scaled background image."""
@@ -105,60 +151,127 @@ class Camera:
         """Save a screenshot of the current screen."""
         pygame.image.save(self.window, "screenshot.png")
 
-    def save_gif(self) -> None:
-        """Save a number of screenshots to create an animated gif."""
-        self.images_to_save = 200
-        self.images = []
-
-    def update(self, elapsed_time: float) -> None:
-        # draw background image
+    def toggle_recording(self) -> None:
+        """Start or stop recording the window."""
+        self.recorder.toggle(self.window)
+
+    def update(self, elapsed_time: float) -> list[Rect] | None:
+        """Draw the next frame and return the areas of the window that changed, or None if the whole window changed.
+
+        In dirty rectangle mode only the areas drawn in the last frame are restored from the background, otherwise the
+        whole background is drawn.
+        """
+        with self.profiler.phase("drawing"):
+            previous_rects = self.draw_background()
+
+        with self.profiler.phase("projection"):
+            # update positions
+            self.history.append(np.array([body.body_model.position for body in self.body_viewers]))
+
+            # project the positions of all bodies at once; the whole tail only if the settings that determine it changed
+            redraw_tail = self.settings.tail and self.settings.tail_settings_changed(self._previous_settings)
+            self._previous_settings = self.settings.copy()
+            positions = self.history.last(len(self.history) if redraw_tail else 1)
+            origins = positions[self.body_viewers.index(self.settings.bodyToTrack)]
+            projection = Projection(self.settings, self.body_viewers[0].scale_factor)
+            screen_positions = projection.project(positions, origins)
+
+            width, height = self.window.get_width(), self.window.get_height()
+            drawables: list[Drawable] = []
+            if self.cloud:
+                drawables.append(self.cloud.drawable(projection, origins[-1], width, height))
+            for body, body_screen_positions in zip(self.body_viewers, screen_positions):
+                body.update_screen_positions(body_screen_positions, redraw_tail)
+                drawables.extend(body.drawables(self.settings, width, height))
+
+        with self.profiler.phase("culling"):
+            drawables = [drawable for drawable in drawables if drawable.in_window(width, height)]
+            drawables.sort(key=attrgetter("z"), reverse=True)
+
+        with self.profiler.phase("drawing"):
+            drawn_rects = [drawable.draw(self.window) for drawable in drawables]
+            drawn_rects.extend(self.draw_hud(elapsed_time))
+
+        if not self.dirty_rects:
+            return None
+        self._drawn_rects = drawn_rects
+        changed_rects = None if previous_rects is None else previous_rects + drawn_rects
+        if changed_rects is None or sum(rect.width * rect.height for rect in changed_rects) > width * height:
+            return None  # Updating the whole window is cheaper
+        return changed_rects
+
+    def draw_background(self) -> list[Rect] | None:
+        """Draw the background and return the areas restored, or None if the whole background was drawn."""
+        if self.dirty_rects and self._drawn_rects is not None:
+            for rect in self._drawn_rects:
+                self.window.blit(self.scaled_background_image, rect, rect)
+            return self._drawn_rects
         self.window.blit(self.scaled_background_image, (0, 0))
+        return None
 
-        # update positions
-        for body in self.body_viewers:
-            body.update_position()
-
-        # render bodies
-        drawables: list[Drawable] = []
-        for body in self.body_viewers:
-            body.update_screen_positions(self.settings)
-            drawables.extend(body.drawables(self.settings))
-        width, height = self.window.get_width(), self.window.get_height()
-        drawables = [drawable for drawable in drawables if drawable.in_window(width, height)]
-        for drawable in sorted(drawables, key=attrgetter("z"), reverse=True):
-            drawable.draw(self.window)
+    def draw_hud(self, elapsed_time: float) -> list[Rect]:
+        """Draw the labels with the state of the simulation and return the areas drawn."""
+        drawn_rects = []
 
         # draw the elapsed time in years
         elapsed_years = round(elapsed_time / self.SECONDS_PER_YEAR, 1)
-        self.draw_label(f"Elapsed time: {elapsed_years} years", (25, 25))
+        drawn_rects.append(self.draw_label(f"Elapsed time: {elapsed_years} years", (25, 25)))
 
         # display the spatial scale
         pixel_size = 0.026  # cm
         spatial_scale = round(self.body_viewers[0].scale_factor * AU * self.settings.zoomLevel * pixel_size, 2)
-        self.draw_label(f"Spatial scale: {spatial_scale} cm = 1 AU", (25, 48))
+        drawn_rects.append(self.draw_label(f"Spatial scale: {spatial_scale} cm = 1 AU", (25, 48)))
 
         # display the temporal scale, take the average of the maxlen of the deque
         self.temporal_scale = self.time.speedup / (24 * 3600)
-        self.draw_label(f"Temporal scale: 1 second = {round(self.temporal_scale, 1)} days", (25, 71))
+        drawn_rects.append(
+            self.draw_label(f"Temporal scale: 1 second = {round(self.temporal_scale, 1)} days", (25, 71))
+        )
 
         # display whether radius is scaled or not
-        self.draw_label(f"Bodies to scale: {'Yes' if self.settings.scaled_radius else 'No'}", (25, 94))
-
-        if self.images_to_save > 0:
-            self.images.append(Image.frombytes("RGB", (width, height), pygame.image.tostring(self.window, "RGB")))
-            self.draw_label("Recording gif...", (width // 2 - 20, 50))
-
-            self.images_to_save -= 1
-            if self.images_to_save == 0:
-                # Save into a GIF file that loops forever
-                kwargs = dict(append_images=self.images[1:], save_all=True, duration=30, loop=0)
-                self.thread = threading.Thread(target=self.images[0].save, args=("animated.gif",), kwargs=kwargs)
-                self.thread.start()
-
-        if self.thread and self.thread.is_alive():
-            self.draw_label("Saving gif...", (width // 2 - 20, 50))
-
-    def draw_label(self, text: str, coordinate: tuple[int, int], color=(255, 255, 255)) -> None:
-        """Draw the label."""
-        label = self.font.render(text, True, color)
-        self.window.blit(label, coordinate)
+        drawn_rects.append(
+            self.draw_label(f"Bodies to scale: {'Yes' if self.settings.scaled_radius else 'No'}", (25, 94))
+        )
+
+        # display the relative drift of the conserved quantities
+        if self.diagnostics and self.diagnostics.visible:
+            drawn_rects.append(self.draw_label(f"Energy error: {self.diagnostics.energy_error:.2e}", (25, 117)))
+            drawn_rects.append(
+                self.draw_label(f"Angular momentum error: {self.diagnostics.angular_momentum_error:.2e}", (25, 140))
+            )
+            drawn_rects.append(self.draw_label(f"Momentum error: {self.diagnostics.momentum_error:.2e}", (25, 163)))
+
+        width = self.window.get_width()
+        if self.recorder.recording:
+            self.recorder.record(self.window)
+            drawn_rects.append(self.draw_label("Recording...", (width // 2 - 20, 50)))
+        elif self.recorder.saving:
+            drawn_rects.append(self.draw_label("Saving...", (width // 2 - 20, 50)))
+
+        # display the rolling percentiles of the frame times, refreshed twice a second at 60 frames per second
+        if self.profiler.visible:
+            if self.profiler.frame % 30 == 0 or not self._profile_rows:
+                self._profile_rows = [["ms", *(f"p{percentile}" for percentile in self.profiler.PERCENTILES)]]
+                self._profile_rows.extend(
+                    [phase, *(f"{time:.2f}" for time in times)] for phase, times in self.profiler.percentiles().items()
+                )
+            for row_number, row in enumerate(self._profile_rows):
+                for x, text in zip((width - 320, width - 210, width - 145, width - 80), row):
+                    drawn_rects.append(self.draw_label(text, (x, 25 + 23 * row_number)))
+        return drawn_rects
+
+    def toggle_diagnostics(self) -> None:
+        """Show or hide the conservation diagnostics, which drift from their values when they were first shown."""
+        if self.diagnostics is None and self.create_diagnostics:
+            self.diagnostics = self.create_diagnostics()
+        if self.diagnostics:
+            self.diagnostics.toggle()
+
+    def draw_label(self, text: str, coordinate: tuple[int, int], color=(255, 255, 255)) -> Rect:
+        """Draw the label and return the area drawn."""
+        return self.window.blit(self.render_label(text, color), coordinate)
+
+    @functools.lru_cache(maxsize=64)
+    def render_label(self, text: str, color: tuple[int, int, int]) -> Surface:
+        """Return the rendered label, which is only rendered again when the text changes."""
+        return self.font.render(text, True, color)
@@ -12,15 +12,18 @@ else:
     from pygame.event import EventType
 
 from controllers.camera import Camera
-from controllers.time import Time
+from controllers.time import ReplayTime, Time
+from models.constellation import Constellation
+from models.physics_process import PhysicsProcess
 
 
 class EventHandler:
     """Handle user input in the form of pygame events, such as keyboard and mouse events."""
 
-    def __init__(self, camera: Camera, time: Time) -> None:
+    def __init__(self, camera: Camera, time: Time, constellation: Constellation | PhysicsProcess) -> None:
         self.camera = camera
         self.time = time
+        self.constellation = constellation
         self._mouse_button_down_position = Vector2(-100, -100)
 
     def handle_events(self) -> None:
@@ -30,6 +33,7 @@ class EventHandler:
 
     def handle_event(self, event: EventType) -> None:
         """Handle one pygame event."""
+        replay = isinstance(self.time, ReplayTime)
         match event:
             case EventType(type=pygame.QUIT) | EventType(type=pygame.KEYDOWN, key=pygame.K_q):  # type: ignore[misc]
                 pygame.quit()
@@ -51,8 +55,12 @@ class EventHandler:
                     self.camera.pan(Vector2(*event.rel))
                 if pygame.mouse.get_pressed()[2]:
                     self.camera.rotate(Vector2(*event.rel))
+            case EventType(type=pygame.KEYDOWN, key=pygame.K_b):  # type: ignore[misc]
+                self.constellation.toggle_gravity()
+            case EventType(type=pygame.KEYDOWN, key=pygame.K_e):  # type: ignore[misc]
+                self.camera.toggle_diagnostics()
             case EventType(type=pygame.KEYDOWN, key=pygame.K_g):  # type: ignore[misc]
-                self.camera.save_gif()
+                self.camera.toggle_recording()
             case EventType(type=pygame.KEYDOWN, key=pygame.K_l):  # type: ignore[misc]
                 self.camera.toggle_labels()
             case EventType(type=pygame.KEYDOWN, key=pygame.K_s):  # type: ignore[misc]
@@ -60,12 +68,26 @@ class EventHandler:
                     self.camera.toggle_scaled_radius()
                 elif event.mod & pygame.KMOD_SHIFT:
                     self.camera.save_screenshot()
+            case EventType(type=pygame.KEYDOWN, key=pygame.K_p):  # type: ignore[misc]
+                self.camera.profiler.toggle()
             case EventType(type=pygame.KEYDOWN, key=pygame.K_t):  # type: ignore[misc]
                 self.camera.toggle_tail()
             case EventType(type=pygame.KEYDOWN, key=pygame.K_UP):  # type: ignore[misc]
                 self.time.faster()
             case EventType(type=pygame.KEYDOWN, key=pygame.K_DOWN):  # type: ignore[misc]
                 self.time.slower()
+            case EventType(type=pygame.KEYDOWN, key=pygame.K_LEFT) if replay:  # type: ignore[misc]
+                self.time.seek(-0.05)  # type: ignore[attr-defined]
+                self.camera.clear_tails()
+            case EventType(type=pygame.KEYDOWN, key=pygame.K_RIGHT) if replay:  # type: ignore[misc]
+                self.time.seek(0.05)  # type: ignore[attr-defined]
+                self.camera.clear_tails()
+            case EventType(type=pygame.KEYDOWN, key=pygame.K_HOME) if replay:  # type: ignore[misc]
+                self.time.seek(-1.0)  # type: ignore[attr-defined]
+                self.camera.clear_tails()
+            case EventType(type=pygame.KEYDOWN, key=pygame.K_END) if replay:  # type: ignore[misc]
+                self.time.seek(1.0)  # type: ignore[attr-defined]
+                self.camera.clear_tails()
             case EventType(type=pygame.KEYDOWN, key=pygame.K_r):  # type: ignore[misc]
                 self.camera.reset_rotation()
                 self.camera.reset_BodyToTrack()
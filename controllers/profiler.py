@@ -0,0 +1,73 @@
+"""Per-phase frame time profiler."""
+
+import atexit
+import collections
+import contextlib
+import csv
+import time
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+
+class Profiler:
+    """Measure the time spent in each phase of every frame.
+
+    Keeps the times of the last frames to report rolling percentiles and optionally writes the times of every frame
+    to a CSV file.
+    """
+
+    PHASES = ("events", "physics", "projection", "culling", "drawing", "display")
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, frames: int = 300, csv_path: Path | None = None) -> None:
+        self.visible = False  # Whether the profile is shown on screen
+        self.frame = 0
+        self._current = dict.fromkeys(self.PHASES, 0.0)  # s, time spent in each phase during the current frame
+        self._times: collections.deque[list[float]] = collections.deque(maxlen=frames)  # ms, per phase and in total
+        self._frame_start = time.perf_counter()
+        self._csv_file = None
+        if csv_path:
+            self._csv_file = csv_path.open("w", newline="")
+            self._csv_writer = csv.writer(self._csv_file)
+            self._csv_writer.writerow(["frame", *(f"{phase}_ms" for phase in self.PHASES), "frame_ms"])
+            atexit.register(self.close)
+
+    def toggle(self) -> None:
+        """Show or hide the profile."""
+        self.visible = not self.visible
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the time spent in the with block to the phase of the current frame."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._current[name] += time.perf_counter() - start
+
+    def end_frame(self) -> None:
+        """Store the times of the current frame and start a new one."""
+        now = time.perf_counter()
+        times = [1000 * self._current[phase] for phase in self.PHASES] + [1000 * (now - self._frame_start)]
+        self._times.append(times)
+        if self._csv_file:
+            self._csv_writer.writerow([self.frame, *(f"{value:.3f}" for value in times)])
+        self._current = dict.fromkeys(self.PHASES, 0.0)
+        self._frame_start = now
+        self.frame += 1
+
+    def percentiles(self) -> dict[str, np.ndarray]:
+        """Return the percentiles of the times of the last frames in ms, per phase and for the whole frame."""
+        if not self._times:
+            return {}
+        percentiles = np.percentile(np.array(self._times), self.PERCENTILES, axis=0)
+        return dict(zip([*self.PHASES, "frame"], percentiles.T))
+
+    def close(self) -> None:
+        """Close the CSV file."""
+        atexit.unregister(self.close)
+        if self._csv_file:
+            self._csv_file.close()
+            self._csv_file = None
@@ -0,0 +1,106 @@
+"""Record the window to an animated GIF or a PNG sequence."""
+
+import atexit
+import multiprocessing
+import multiprocessing.process
+import queue
+from multiprocessing.queues import Queue
+from pathlib import Path
+
+import pygame
+from pygame.surface import Surface
+from PIL import GifImagePlugin, Image
+
+
+class Recorder:
+    """Record frames of the window, encoded incrementally by a background process, so memory use stays constant.
+
+    Frames are downscaled and handed to the encoder through a bounded queue. If the encoder falls behind, frames are
+    dropped rather than stalling the frame loop. A path ending in .gif is written as an animated GIF, any other path
+    as a directory of PNG files.
+    """
+
+    def __init__(
+        self, path: Path, scale: float = 0.5, every: int = 1, duration: int = 30, queue_size: int = 16
+    ) -> None:
+        self.path = path
+        self.scale = scale  # Downscale factor of the frames
+        self.every = every  # Record every this many frames
+        self.duration = duration  # ms, duration of each frame in the GIF
+        self.queue_size = queue_size
+        self.frames = 0  # Frames seen since the recording started
+        self.dropped = 0  # Frames dropped because the encoder was behind
+        self.size = (0, 0)
+        self._queue: Queue | None = None
+        self._process: multiprocessing.process.BaseProcess | None = None
+
+    @property
+    def recording(self) -> bool:
+        return self._queue is not None
+
+    @property
+    def saving(self) -> bool:
+        """Return whether the encoder is still writing a finished recording."""
+        return not self.recording and self._process is not None and self._process.is_alive()
+
+    def toggle(self, window: Surface) -> None:
+        """Start or stop recording."""
+        if self.recording:
+            self.stop()
+        else:
+            self.start(window)
+
+    def start(self, window: Surface) -> None:
+        """Start recording frames with the size of the window, downscaled.
+
+        Nothing happens while the previous recording is still being saved, as it is written to the same path.
+        """
+        if self.saving:
+            return
+        self.size = (max(round(window.get_width() * self.scale), 1), max(round(window.get_height() * self.scale), 1))
+        self.frames = self.dropped = 0
+        context = multiprocessing.get_context("spawn")
+        self._queue = context.Queue(self.queue_size)
+        process = context.Process(target=encode, args=(self._queue, self.path, self.size, self.duration))
+        process.start()
+        self._process = process
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Stop recording. The encoder process finishes writing the queued frames in the background."""
+        atexit.unregister(self.stop)
+        if self._queue is not None:
+            self._queue.put(None)
+            self._queue = None
+
+    def record(self, window: Surface) -> None:
+        """Hand the frame shown in the window to the encoder, if it is one of the frames to record."""
+        if self._queue is None:
+            return
+        self.frames += 1
+        if (self.frames - 1) % self.every != 0:
+            return
+        surface = window if window.get_size() == self.size else pygame.transform.smoothscale(window, self.size)
+        try:
+            self._queue.put_nowait(pygame.image.tostring(surface, "RGB"))
+        except queue.Full:
+            self.dropped += 1
+
+
+def encode(frames: Queue, path: Path, size: tuple[int, int], duration: int) -> None:
+    """Encode the frames from the queue as they arrive, until None is received."""
+    if path.suffix.lower() == ".gif":
+        with path.open("wb") as gif_file:
+            for index, frame in enumerate(iter(frames.get, None)):
+                image = Image.frombytes("RGB", size, frame).quantize(method=Image.Quantize.FASTOCTREE)
+                if index == 0:
+                    header, _ = GifImagePlugin.getheader(image, info=dict(loop=0, duration=duration))
+                    gif_file.write(b"".join(header))
+                for fragment in GifImagePlugin.getdata(image, duration=duration, include_color_table=True):
+                    gif_file.write(fragment)
+            if gif_file.tell():
+                gif_file.write(b";")  # GIF trailer
+    else:
+        path.mkdir(parents=True, exist_ok=True)
+        for index, frame in enumerate(iter(frames.get, None)):
+            Image.frombytes("RGB", size, frame).save(path / f"frame_{index:06d}.png")
@@ -3,10 +3,16 @@
 import time
 import collections
 
+from models.lookahead import LookAhead
+from models.physics_process import PhysicsProcess
+from models.replay import Replay
+
 
 class Time:
     """Model the progress of time."""
 
+    max_calculations = 120  # Maximum number of time steps per update
+
     def __init__(self, time_step: float) -> None:
         self.elapsed_time = 0.0
         self.time_step = time_step
@@ -18,6 +24,10 @@ class Time:
         """Update the time."""
         elapsed_time = self.time_step * self.calculations
         self.elapsed_time += elapsed_time
+        self.update_speedup(elapsed_time)
+
+    def update_speedup(self, elapsed_time: float) -> None:
+        """Update the average simulated time per second."""
         now = time.time()
         if now - self._timestamp != 0:
             self.speedups.append(elapsed_time / (now - self._timestamp))
@@ -28,4 +38,87 @@ class Time:
         self.calculations = max(round(self.calculations / 2), 1)
 
     def faster(self) -> None:
-        self.calculations = min(self.calculations * 2, 120)
+        self.calculations = min(self.calculations * 2, self.max_calculations)
+
+
+class ReplayTime(Time):
+    """Model the progress of time while replaying a recorded trajectory, forwards or backwards.
+
+    The calculations are the number of frames to advance per update. Slowing down past one frame per update reverses
+    the direction of play.
+    """
+
+    def __init__(self, replay: Replay | LookAhead) -> None:
+        super().__init__(replay.time_step)
+        self.replay = replay
+        self.calculations = 1
+        self.elapsed_time = replay.time
+
+    def update(self) -> None:
+        """Show the next frame(s) of the replay."""
+        self.replay.advance(self.calculations)
+        elapsed_time = self.replay.time - self.elapsed_time
+        self.elapsed_time = self.replay.time
+        self.update_speedup(elapsed_time)
+
+    def seek(self, fraction: float) -> None:
+        """Jump forward, or backward if the fraction is negative, by a fraction of the recording."""
+        self.replay.advance(round(fraction * len(self.replay)))
+        self.elapsed_time = self.replay.time
+
+    def slower(self) -> None:
+        if self.calculations == 1:
+            self.calculations = -1
+        elif self.calculations > 0:
+            self.calculations = round(self.calculations / 2)
+        else:
+            self.calculations = max(self.calculations * 2, -self.max_calculations)
+
+    def faster(self) -> None:
+        if self.calculations == -1:
+            self.calculations = 1
+        elif self.calculations < 0:
+            self.calculations = round(self.calculations / 2)
+        else:
+            self.calculations = min(self.calculations * 2, self.max_calculations)
+
+
+class LookAheadTime(ReplayTime):
+    """Model the progress of time while showing the time steps computed ahead by a look-ahead worker.
+
+    The calculations are the number of time steps to advance per update. As the time steps up to the last keyframe
+    are computed already, the speed is not limited by the time steps that fit in a frame.
+    """
+
+    max_calculations = 2**16
+
+    def __init__(self, look_ahead: LookAhead) -> None:
+        super().__init__(look_ahead)
+        self.calculations = 30
+
+
+class PhysicsTime(Time):
+    """Model the progress of time while the constellation is integrated by a separate physics process.
+
+    The speedup is measured from the simulated time of the snapshots, so it reports the actual rate of the physics.
+    """
+
+    def __init__(self, physics: PhysicsProcess, time_step: float) -> None:
+        super().__init__(time_step)
+        self.physics = physics
+        self.physics.calculations = self.calculations
+
+    def update(self) -> None:
+        """Show the latest snapshot of the physics process."""
+        time = self.physics.update()
+        elapsed_time = time - self.elapsed_time
+        self.elapsed_time = time
+        self.update_speedup(elapsed_time)
+
+    def slower(self) -> None:
+        super().slower()
+        self.physics.calculations = self.calculations
+
+    def faster(self) -> None:
+        super().faster()
+        self.physics.calculations = self.calculations
@@ -0,0 +1,71 @@
+"""Structure-of-arrays storage for the state of cellestial bodies."""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+
+class BodyArrays:
+    """Hold the positions, velocities, accelerations, masses and radii of bodies as contiguous arrays.
+
+    The arrays of an ensemble of independent copies of a constellation have a leading ensemble dimension: the
+    positions of K copies of N bodies are a (K, N, 3) array and their masses a (K, N) array.
+    """
+
+    def __init__(
+        self,
+        positions: np.ndarray,
+        velocities: np.ndarray,
+        masses: np.ndarray,
+        radii: np.ndarray,
+    ) -> None:
+        self.positions = np.ascontiguousarray(positions, dtype=np.float64)  # m
+        self.velocities = np.ascontiguousarray(velocities, dtype=np.float64)  # m/s
+        self.accelerations = np.zeros_like(self.positions)  # m/s^2
+        self.masses = np.ascontiguousarray(masses, dtype=np.float64)  # kg
+        self.radii = np.ascontiguousarray(radii, dtype=np.float64)  # m
+
+    @classmethod
+    def concatenate(cls, arrays: Sequence[BodyArrays]) -> BodyArrays:
+        """Return new arrays that hold the bodies of all the given arrays."""
+        concatenated = cls(
+            np.concatenate([array.positions for array in arrays]),
+            np.concatenate([array.velocities for array in arrays]),
+            np.concatenate([array.masses for array in arrays]),
+            np.concatenate([array.radii for array in arrays]),
+        )
+        concatenated.accelerations = np.concatenate([array.accelerations for array in arrays])
+        return concatenated
+
+    @classmethod
+    def stack(cls, members: Sequence[BodyArrays]) -> BodyArrays:
+        """Return new arrays that hold the given arrays as the members of an ensemble."""
+        stacked = cls(
+            np.stack([member.positions for member in members]),
+            np.stack([member.velocities for member in members]),
+            np.stack([member.masses for member in members]),
+            np.stack([member.radii for member in members]),
+        )
+        stacked.accelerations = np.stack([member.accelerations for member in members])
+        return stacked
+
+    def take(self, indices: Sequence[int]) -> BodyArrays:
+        """Return new arrays that hold the given bodies."""
+        taken = BodyArrays(self.positions[indices], self.velocities[indices], self.masses[indices], self.radii[indices])
+        taken.accelerations = self.accelerations[indices]
+        return taken
+
+    @property
+    def ensemble_size(self) -> int | None:
+        """Return the number of members of the ensemble, or None if the arrays are not an ensemble."""
+        return len(self.masses) if self.masses.ndim == 2 else None
+
+    def center_of_mass(self) -> np.ndarray:
+        """Return the center of mass of the bodies, or of each member of the ensemble."""
+        return np.einsum("...i,...ij->...j", self.masses, self.positions) / self.masses.sum(axis=-1)[..., np.newaxis]
+
+    def __len__(self) -> int:
+        """Return the number of bodies."""
+        return self.masses.shape[-1]
@@ -0,0 +1,242 @@
+"""Barnes–Hut octree gravity solver."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from .gravity import GRAVITATIONAL_CONSTANT
+
+
+def spread_bits(values: np.ndarray) -> np.ndarray:
+    """Insert two zero bits between each of the lowest 21 bits of the values."""
+    values = values.astype(np.uint64) & np.uint64(0x1FFFFF)
+    for shift, mask in (
+        (32, 0x1F00000000FFFF),
+        (16, 0x1F0000FF0000FF),
+        (8, 0x100F00F00F00F00F),
+        (4, 0x10C30C30C30C30C3),
+        (2, 0x1249249249249249),
+    ):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def morton_codes(cells: np.ndarray) -> np.ndarray:
+    """Return the Morton (Z-order) codes of integer cell coordinates, so that nearby cells get nearby codes."""
+    return (
+        (spread_bits(cells[:, 0]) << np.uint64(2))
+        | (spread_bits(cells[:, 1]) << np.uint64(1))
+        | spread_bits(cells[:, 2])
+    )
+
+
+def expand(starts: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return, for every range start:start+count, the index of the range and the values in the range."""
+    ranges = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return ranges, starts[ranges] + offsets
+
+
+class OctreeLevel:
+    """The nodes of one level of a linear octree, as ranges of the Morton-sorted bodies."""
+
+    def __init__(self, keys: np.ndarray, starts: np.ndarray, ends: np.ndarray, size: float) -> None:
+        self.keys = keys
+        self.starts = starts
+        self.ends = ends
+        self.size = size  # Length of the edge of the cubes of this level, m
+        self.masses = np.empty(0)
+        self.centers_of_mass = np.empty((0, 3))
+        self.leaf = np.empty(0, dtype=bool)
+        self.first_child = self.last_child = np.empty(0, dtype=np.int64)
+
+
+class BarnesHutGravity:
+    """Approximate the gravitational accelerations with a Barnes–Hut octree in O(N log N) per step.
+
+    Groups of bodies that are small as seen from a body, i.e. whose cube size divided by their distance is below the
+    opening angle theta, act on that body as one point mass in their center of mass. Theta 0 gives the exact result.
+    """
+
+    name = "barnes-hut"
+    MAX_DEPTH = 21  # Three times 21 bits fit in the 64 bits Morton codes
+    CHUNK_SIZE = 4096  # Number of bodies that walk the tree together, limits the memory use of the walk
+
+    def __init__(self, theta: float = 0.5, leaf_size: int = 8) -> None:
+        self.theta = theta
+        self.leaf_size = leaf_size
+        self._corner = np.zeros(3)
+        self._size = 0.0
+        self._order = np.empty(0, dtype=np.int64)  # Morton order of the massive bodies in the tree
+        self._walk_order = np.empty(0, dtype=np.int64)  # Morton order of the target bodies that walk the tree
+
+    def accelerations(self, positions: np.ndarray, masses: np.ndarray, targets: np.ndarray | None = None) -> np.ndarray:
+        """Return the gravitational acceleration of the target bodies (default all) due to all other bodies.
+
+        Only bodies with mass are sources, so the tree holds the massive bodies and the test particles only walk it.
+        """
+        if positions.ndim == 3:  # Each member of an ensemble has a tree of its own
+            return np.stack([self.accelerations(*member, targets) for member in zip(positions, masses)])
+        targets = np.arange(len(positions)) if targets is None else targets
+        sources = np.flatnonzero(masses)
+        accelerations = np.zeros((len(targets), 3))
+        if not len(sources):
+            return accelerations
+        order, levels = self.build(positions[sources], masses[sources])
+        sorted_positions, sorted_masses = positions[sources][order], masses[sources][order]
+        ranks = np.full(len(positions), -1)  # Index of each body in the sorted sources, -1 for massless bodies
+        ranks[sources[order]] = np.arange(len(sources))
+        # Walk the tree in Morton order, so that consecutive bodies visit the same nodes and memory access is local
+        codes = self.encode(positions[targets])
+        self._walk_order = walk_order = self.sort(codes, self._walk_order)
+        for first in range(0, len(targets), self.CHUNK_SIZE):
+            walkers = walk_order[first : first + self.CHUNK_SIZE]
+            accelerations[walkers] = self.traverse(
+                sorted_positions,
+                sorted_masses,
+                levels,
+                positions[targets[walkers]],
+                codes[walkers],
+                ranks[targets[walkers]],
+            )
+        return accelerations
+
+    def state(self) -> dict[str, np.ndarray]:
+        """Return the bounding cube and the Morton order of the previous step, which shape the next tree."""
+        return dict(corner=self._corner, size=np.array(self._size), order=self._order)
+
+    def load_state(self, state: dict[str, np.ndarray]) -> None:
+        """Restore the bounding cube and the Morton order from a checkpoint, or start afresh if it has none."""
+        self._corner = state.get("corner", np.zeros(3))
+        self._size = float(state.get("size", 0.0))
+        self._order = state.get("order", np.empty(0, dtype=np.int64))
+
+    def update_bounding_cube(self, positions: np.ndarray) -> None:
+        """Keep the cube of the previous step when it still fits the bodies snugly, otherwise grow or shrink it."""
+        lower, upper = positions.min(axis=0), positions.max(axis=0)
+        extent = float((upper - lower).max()) or 1.0
+        inside = np.all(lower >= self._corner) and np.all(upper < self._corner + self._size)
+        if not inside or self._size > 2 * extent:
+            self._size = extent * 1.25
+            self._corner = (lower + upper) / 2 - self._size / 2
+
+    def encode(self, positions: np.ndarray) -> np.ndarray:
+        """Return the Morton codes of the deepest cells of the bounding cube at the positions, clipped to the cube."""
+        cells = ((positions - self._corner) * (2**self.MAX_DEPTH / self._size)).astype(np.int64)
+        return morton_codes(np.clip(cells, 0, 2**self.MAX_DEPTH - 1))
+
+    @staticmethod
+    def sort(codes: np.ndarray, previous: np.ndarray) -> np.ndarray:
+        """Return the order of the bodies along the Morton curve, starting from their order of the previous step.
+
+        Bodies move little per step, so the previous order is nearly sorted and the stable sort runs close to O(N).
+        """
+        if len(previous) != len(codes):
+            previous = np.arange(len(codes))
+        return previous[np.argsort(codes[previous], kind="stable")]
+
+    def build(self, positions: np.ndarray, masses: np.ndarray) -> tuple[np.ndarray, list[OctreeLevel]]:
+        """Rebuild the octree of the bodies and return their Morton order and the levels of the tree."""
+        self.update_bounding_cube(positions)
+        codes = self.encode(positions)
+        self._order = order = self.sort(codes, self._order)
+        sorted_codes, sorted_masses = codes[order], masses[order]
+        sorted_moments = positions[order] * sorted_masses[:, np.newaxis]
+        levels: list[OctreeLevel] = []
+        for depth in range(self.MAX_DEPTH + 1):
+            keys = sorted_codes >> np.uint64(3 * (self.MAX_DEPTH - depth))
+            starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+            ends = np.append(starts[1:], len(keys))
+            level = OctreeLevel(keys[starts], starts, ends, self._size / 2**depth)
+            level.masses = np.add.reduceat(sorted_masses, starts)
+            moments = np.add.reduceat(sorted_moments, starts)
+            level.centers_of_mass = np.divide(
+                moments,
+                level.masses[:, np.newaxis],
+                out=positions[order][starts],
+                where=level.masses[:, np.newaxis] > 0,
+            )
+            level.leaf = (ends - starts <= self.leaf_size) | (depth == self.MAX_DEPTH)
+            levels.append(level)
+            if level.leaf.all():
+                break
+        for parent, children in zip(levels, levels[1:]):
+            parent.first_child = np.searchsorted(children.starts, parent.starts)
+            parent.last_child = np.searchsorted(children.starts, parent.ends)
+        return order, levels
+
+    def traverse(
+        self,
+        positions: np.ndarray,
+        masses: np.ndarray,
+        levels: list[OctreeLevel],
+        walker_positions: np.ndarray,
+        walker_codes: np.ndarray,
+        walker_ranks: np.ndarray,
+    ) -> np.ndarray:
+        """Walk the tree of the sorted sources for the given bodies at once, level by level, and sum their accelerations.
+
+        The ranks of the walkers are their index in the sources, or -1 for massless bodies, so no body attracts itself.
+        """
+        accelerations = np.zeros((len(walker_positions), 3))
+        bodies = np.arange(len(walker_positions))  # Index into the walkers
+        nodes = np.zeros(len(walker_positions), dtype=np.int64)  # Every body starts at the root node
+        for depth, level in enumerate(levels):
+            separations = level.centers_of_mass[nodes] - walker_positions[bodies]
+            distances_squared = np.einsum("ij,ij->i", separations, separations)
+            containing = (walker_codes[bodies] >> np.uint64(3 * (self.MAX_DEPTH - depth))) == level.keys[nodes]
+            far = ~containing & (level.size**2 < self.theta**2 * distances_squared)
+            self.add(accelerations, bodies[far], separations[far], distances_squared[far], level.masses[nodes[far]])
+            near_leaf = ~far & level.leaf[nodes]
+            self.add_direct(
+                accelerations,
+                positions,
+                masses,
+                walker_positions,
+                walker_ranks,
+                bodies[near_leaf],
+                level,
+                nodes[near_leaf],
+            )
+            opened = ~far & ~level.leaf[nodes]
+            bodies, nodes = bodies[opened], nodes[opened]
+            first_child = level.first_child[nodes]
+            pairs, nodes = expand(first_child, level.last_child[nodes] - first_child)
+            bodies = bodies[pairs]
+        return accelerations
+
+    def add_direct(
+        self,
+        accelerations: np.ndarray,
+        positions: np.ndarray,
+        masses: np.ndarray,
+        walker_positions: np.ndarray,
+        walker_ranks: np.ndarray,
+        bodies: np.ndarray,
+        level: OctreeLevel,
+        nodes: np.ndarray,
+    ) -> None:
+        """Add the accelerations due to the individual bodies in the leaf nodes."""
+        starts = level.starts[nodes]
+        pairs, sources = expand(starts, level.ends[nodes] - starts)
+        bodies = bodies[pairs]
+        distinct = sources != walker_ranks[bodies]
+        bodies, sources = bodies[distinct], sources[distinct]
+        separations = positions[sources] - walker_positions[bodies]
+        distances_squared = np.einsum("ij,ij->i", separations, separations)
+        self.add(accelerations, bodies, separations, distances_squared, masses[sources])
+
+    @staticmethod
+    def add(
+        accelerations: np.ndarray,
+        bodies: np.ndarray,
+        separations: np.ndarray,
+        distances_squared: np.ndarray,
+        masses: np.ndarray,
+    ) -> None:
+        """Add the accelerations due to point masses at the given separations from the bodies."""
+        weights = GRAVITATIONAL_CONSTANT * masses * distances_squared**-1.5
+        for axis in range(3):
+            accelerations[:, axis] += np.bincount(
+                bodies, weights=separations[:, axis] * weights, minlength=len(accelerations)
+            )
@@ -0,0 +1,120 @@
+"""Checkpoints with the complete state of a simulation, to resume it later.
+
+A checkpoint is a NumPy .npz file with the arrays of the remaining bodies, the index of their body in the constellation
+JSON file, the elapsed time, the name and state of the integrator, the state of the gravity solver and, optionally,
+the tail histories of the views.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .arrays import BodyArrays
+from .constellation import Constellation
+from .physicalobject import PhysicalObjectModel
+
+INTEGRATOR_PREFIX = "integrator_"
+GRAVITY_PREFIX = "gravity_"
+
+
+def checkpoint_state(
+    constellation: Constellation,
+    body_models: dict[str, PhysicalObjectModel],
+    elapsed_time: float,
+) -> dict[str, np.ndarray]:
+    """Return the state of the constellation, whose bodies are the given body models by name, without their names.
+
+    The arrays are copies, so the state doesn't change when the constellation is advanced.
+    """
+    arrays = constellation.arrays
+    indices = {id(body_model): index for index, body_model in enumerate(body_models.values())}
+    state = dict(
+        bodies=np.array([indices[id(body_model)] for body_model in constellation.body_models], dtype=np.int64),
+        rows=constellation.rows,
+        positions=arrays.positions,
+        velocities=arrays.velocities,
+        accelerations=arrays.accelerations,
+        masses=arrays.masses,
+        radii=arrays.radii,
+        elapsed_time=np.array(elapsed_time),
+        integrator=np.array(constellation.integrator.name),
+    )
+    state |= {INTEGRATOR_PREFIX + key: value for key, value in constellation.integrator.state().items()}
+    state |= {GRAVITY_PREFIX + key: value for key, value in constellation.gravity.state().items()}
+    return {key: np.array(value) for key, value in state.items()}
+
+
+def restore_state(
+    state: dict[str, np.ndarray], constellation: Constellation, body_models: dict[str, PhysicalObjectModel]
+) -> None:
+    """Restore a state of the constellation, whose bodies are the given body models by name.
+
+    The state is copied, so it can be restored again later. The bodies that had merged in that state are left in the
+    merged body models of the constellation.
+    """
+    arrays = BodyArrays(
+        state["positions"].copy(), state["velocities"].copy(), state["masses"].copy(), state["radii"].copy()
+    )
+    arrays.accelerations = state["accelerations"].copy()
+    models = list(body_models.values())
+    constellation.load_bodies(arrays, [models[index] for index in state["bodies"]], state["rows"].copy())
+    constellation.integrator.load_state(
+        {
+            key.removeprefix(INTEGRATOR_PREFIX): value.copy()
+            for key, value in state.items()
+            if key.startswith(INTEGRATOR_PREFIX)
+        }
+    )
+    constellation.gravity.load_state(
+        {
+            key.removeprefix(GRAVITY_PREFIX): value.copy()
+            for key, value in state.items()
+            if key.startswith(GRAVITY_PREFIX)
+        }
+    )
+
+
+def save_checkpoint(
+    path: Path,
+    constellation: Constellation,
+    body_models: dict[str, PhysicalObjectModel],
+    elapsed_time: float,
+    tails: np.ndarray | None = None,
+) -> None:
+    """Save the state of the constellation, whose bodies are the given body models by name, to a checkpoint file.
+
+    The checkpoint is written to a temporary file first that then replaces the previous checkpoint, so an interrupted
+    write never leaves a corrupt checkpoint behind.
+    """
+    state = dict(names=np.array(list(body_models))) | checkpoint_state(constellation, body_models, elapsed_time)
+    if tails is not None:
+        state["tails"] = tails
+    temporary_path = path.with_name(path.name + ".tmp")
+    with temporary_path.open("wb") as checkpoint_file:
+        np.savez_compressed(checkpoint_file, **state)
+    os.replace(temporary_path, path)
+
+
+class Checkpoint:
+    """The state of a simulation, loaded from a checkpoint file."""
+
+    def __init__(self, path: Path) -> None:
+        with np.load(path) as data:
+            self.state = dict(data)
+        self.names: list[str] = self.state["names"].tolist()
+        self.elapsed_time = float(self.state["elapsed_time"])
+        self.integrator = str(self.state["integrator"])
+        self.tails: np.ndarray | None = self.state.get("tails")
+
+    def restore(self, constellation: Constellation, body_models: dict[str, PhysicalObjectModel]) -> None:
+        """Restore the state of the constellation, whose bodies are the given body models by name.
+
+        The bodies that had merged when the checkpoint was saved are left in the merged body models of the
+        constellation.
+        """
+        if self.names != list(body_models):
+            raise ValueError("The checkpoint has other bodies than the constellation")
+        if self.integrator != constellation.integrator.name:
+            raise ValueError(f"The checkpoint is of the {self.integrator} integrator")
+        restore_state(self.state, constellation, body_models)
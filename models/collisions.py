@@ -0,0 +1,79 @@
+"""Collision detection with a sweep-and-prune broad phase, and inelastic merging of colliding bodies."""
+
+import numpy as np
+
+from .arrays import BodyArrays
+
+
+def candidate_pairs(positions: np.ndarray, radii: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the pairs of bodies whose extents overlap along the axis with the largest spread (sweep and prune).
+
+    The extents are sorted by their lower bound once, so finding the overlaps costs O(N log N) plus the number of
+    overlaps, instead of O(N²) for checking all pairs.
+    """
+    axis = int(np.argmax(np.ptp(positions, axis=0)))
+    order = np.argsort(positions[:, axis] - radii)
+    lower = positions[order, axis] - radii[order]
+    upper = positions[order, axis] + radii[order]
+    # The extent of the i-th body overlaps with those of the next bodies up to the first that starts after it ends
+    ends = np.searchsorted(lower, upper, side="right")
+    counts = np.maximum(ends - np.arange(len(order)) - 1, 0)
+    first = np.repeat(np.arange(len(order)), counts)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return order[first], order[second]
+
+
+def colliding_pairs(positions: np.ndarray, radii: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the pairs of bodies that touch or overlap."""
+    first, second = candidate_pairs(positions, radii)
+    separations = positions[second] - positions[first]
+    touching = np.einsum("ij,ij->i", separations, separations) <= (radii[first] + radii[second]) ** 2
+    return first[touching], second[touching]
+
+
+def collision_groups(positions: np.ndarray, radii: np.ndarray) -> list[np.ndarray]:
+    """Return the groups of bodies that collide, directly or through a chain of collisions (union-find)."""
+    first, second = colliding_pairs(positions, radii)
+    if len(first) == 0:
+        return []
+    parents = np.arange(len(radii))
+
+    def root(body: int) -> int:
+        while parents[body] != body:
+            parents[body] = parents[parents[body]]  # Path halving
+            body = parents[body]
+        return body
+
+    for body, other in zip(first.tolist(), second.tolist()):
+        parents[root(body)] = root(other)
+    bodies = np.unique(np.concatenate([first, second]))
+    roots = np.array([root(body) for body in bodies.tolist()])
+    return [bodies[roots == group_root] for group_root in np.unique(roots)]
+
+
+def merge(arrays: BodyArrays, groups: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """Merge each group of bodies into its most massive body and remove the others from the arrays, in place.
+
+    The merged body has the total mass and momentum of the group, at its center of mass, and the total volume.
+    Returns which bodies are kept and the new row of every body, the row of the body it merged into for the removed
+    bodies.
+    """
+    survivors = np.arange(len(arrays))  # The body that each body merges into
+    for group in groups:
+        masses = arrays.masses[group]
+        survivor = group[np.argmax(masses)]
+        survivors[group] = survivor
+        # test particles without mass that collide with each other merge at their average position
+        weights = (masses / masses.sum() if masses.sum() > 0 else np.full(len(group), 1 / len(group)))[:, np.newaxis]
+        arrays.positions[survivor] = (weights * arrays.positions[group]).sum(axis=0)
+        arrays.velocities[survivor] = (weights * arrays.velocities[group]).sum(axis=0)
+        arrays.accelerations[survivor] = (weights * arrays.accelerations[group]).sum(axis=0)
+        arrays.radii[survivor] = np.cbrt((arrays.radii[group] ** 3).sum())
+        arrays.masses[survivor] = masses.sum()
+    keep = survivors == np.arange(len(arrays))
+    arrays.positions = arrays.positions[keep]
+    arrays.velocities = arrays.velocities[keep]
+    arrays.accelerations = arrays.accelerations[keep]
+    arrays.masses = arrays.masses[keep]
+    arrays.radii = arrays.radii[keep]
+    return keep, (np.cumsum(keep) - 1)[survivors]
@@ -1,27 +1,138 @@
+from __future__ import annotations
+
+from itertools import groupby
+from operator import attrgetter
 from typing import Sequence
 
+import numpy as np
+from pygame.math import Vector3
+
+from .arrays import BodyArrays
+from .barneshut import BarnesHutGravity
+from .collisions import collision_groups, merge
+from .gravity import PairwiseGravity
+from .integrators import Integrator, VerletIntegrator
 from .physicalobject import PhysicalObjectModel
 
-from pygame.math import Vector3
+
+def gather(body_models: Sequence[PhysicalObjectModel]) -> BodyArrays:
+    """Return new arrays that hold the bodies, taking consecutive bodies that share arrays, such as a table, at once."""
+    return BodyArrays.concatenate(
+        [
+            arrays.take([body_model.index for body_model in group])
+            for arrays, group in groupby(body_models, attrgetter("arrays"))
+        ]
+    )
 
 
 class CenterOfMass(PhysicalObjectModel):
-    def update_position(self, bodies: Sequence[PhysicalObjectModel], time_step: float) -> None:
-        """Update the position of the center of mass."""
-        total_mass = sum(body.mass for body in bodies)
-        center_of_mass = sum(
-            ((body.position * (body.mass / total_mass)) for body in bodies),
-            start=self.null_vector,
-        )
-        self.position = center_of_mass
+    def update_position(self, arrays: BodyArrays) -> None:
+        """Update the position of the center of mass, of the first member if the arrays are an ensemble."""
+        self.position = Vector3(*arrays.center_of_mass().reshape(-1, 3)[0])
 
 
 class Constellation:
-    def __init__(self, body_models: Sequence[PhysicalObjectModel]) -> None:
-        self.body_models = body_models
+    def __init__(
+        self,
+        body_models: Sequence[PhysicalObjectModel],
+        gravity: str = PairwiseGravity.name,
+        theta: float = 0.5,
+        integrator: Integrator | None = None,
+        collisions: bool = False,
+    ) -> None:
+        self.body_models = list(body_models)
+        self.arrays = gather(body_models)
+        for index, body_model in enumerate(body_models):
+            body_model.bind(self.arrays, index)
+        self.theta = theta  # Opening angle of the Barnes–Hut solver
+        self.gravity: PairwiseGravity | BarnesHutGravity
+        self.set_gravity(gravity)
+        self.integrator = integrator or VerletIntegrator()
+        self.collisions = collisions  # Whether colliding bodies merge
+        self.rows = np.arange(len(body_models))  # Row of each initial body, or of the body it merged into
+        self.merged: list[PhysicalObjectModel] = []  # Body models removed by merging, until taken by pop_merged
         self.center_of_mass = CenterOfMass(Vector3(0, 0, 0), Vector3(0, 0, 0), 100, 0)
+        self.center_of_mass.update_position(self.arrays)
+
+    @classmethod
+    def ensemble(
+        cls,
+        members: Sequence[Sequence[PhysicalObjectModel]],
+        gravity: str = PairwiseGravity.name,
+        theta: float = 0.5,
+        integrator: Integrator | None = None,
+    ) -> Constellation:
+        """Create an ensemble of independent copies of a constellation, with different initial conditions.
+
+        The members are advanced together as one (members, bodies, 3) array operation. The body models of every
+        member become views onto their rows of the ensemble arrays.
+        """
+        arrays = BodyArrays.stack([gather(member) for member in members])
+        constellation = cls(members[0], gravity, theta, integrator)
+        constellation.arrays = arrays
+        constellation.integrator.reset()
+        for member_index, member in enumerate(members):
+            for index, body_model in enumerate(member):
+                body_model.bind(constellation.arrays, (member_index, index))
+        constellation.center_of_mass.update_position(constellation.arrays)
+        return constellation
+
+    def set_gravity(self, name: str) -> None:
+        """Select the gravity solver by name."""
+        if name == PairwiseGravity.name:
+            self.gravity = PairwiseGravity()
+        elif name == BarnesHutGravity.name:
+            self.gravity = BarnesHutGravity(self.theta)
+        else:
+            raise ValueError(f"Unknown gravity solver: {name}")
+
+    def toggle_gravity(self) -> None:
+        """Switch between the exact pairwise and the approximate Barnes–Hut gravity solver."""
+        self.set_gravity(BarnesHutGravity.name if self.gravity.name == PairwiseGravity.name else PairwiseGravity.name)
+
+    def advance(self, steps: int, time_step: float) -> None:
+        """Advance all bodies by a batch of time steps in one call.
+
+        The center of mass is updated once, at the end of the batch.
+        """
+        for _ in range(steps):
+            self.step(time_step)
+        self.center_of_mass.update_position(self.arrays)
+
+    def step(self, time_step: float) -> None:
+        """Advance all bodies by one time step."""
+        self.integrator.step(self.arrays, self.gravity, time_step)
+        if self.collisions:
+            self.merge_collisions()
+
+    def merge_collisions(self) -> None:
+        """Merge the bodies that collide and shrink the arrays to the remaining bodies."""
+        groups = collision_groups(self.arrays.positions, self.arrays.radii)
+        if not groups:
+            return
+        kept, new_rows = merge(self.arrays, groups)
+        self.merged.extend(body_model for body_model, keep in zip(self.body_models, kept) if not keep)
+        self.body_models = [body_model for body_model, keep in zip(self.body_models, kept) if keep]
+        for index, body_model in enumerate(self.body_models):
+            body_model.bind(self.arrays, index)
+        self.rows = new_rows[self.rows]
+        self.integrator.remove_bodies(kept)
+
+    def load_bodies(self, arrays: BodyArrays, body_models: Sequence[PhysicalObjectModel], rows: np.ndarray) -> None:
+        """Replace the state of the bodies, for example by the state saved in a checkpoint.
+
+        The body models that are not given are considered merged.
+        """
+        self.merged.extend(body_model for body_model in self.body_models if body_model not in body_models)
+        self.arrays = arrays
+        self.body_models = list(body_models)
+        for index, body_model in enumerate(self.body_models):
+            body_model.bind(self.arrays, index)
+        self.rows = rows
+        self.integrator.reset()
+        self.center_of_mass.update_position(self.arrays)
 
-    def update_positions(self, time_step: float) -> None:
-        for body_model in self.body_models:
-            body_model.update_position(self.body_models, time_step)
-        self.center_of_mass.update_position(self.body_models, time_step)
+    def pop_merged(self) -> list[PhysicalObjectModel]:
+        """Return and forget the body models removed by merging since the last call."""
+        merged, self.merged = self.merged, []
+        return merged
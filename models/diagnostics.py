@@ -0,0 +1,131 @@
+"""Vectorized conservation diagnostics: energy, momentum and angular momentum."""
+
+import atexit
+import csv
+from pathlib import Path
+
+import numpy as np
+
+from .arrays import BodyArrays
+from .gravity import GRAVITATIONAL_CONSTANT
+
+CHUNK_ELEMENTS = 4_000_000  # Maximum number of pairs of bodies in one pass of the potential energy calculation
+
+
+def kinetic_energy(arrays: BodyArrays) -> np.ndarray:
+    """Return the kinetic energy of the bodies, or of each member of the ensemble."""
+    return 0.5 * np.einsum("...i,...ij,...ij->...", arrays.masses, arrays.velocities, arrays.velocities)
+
+
+def potential_energy(arrays: BodyArrays) -> np.ndarray:
+    """Return the gravitational potential energy of the bodies, or of each member of the ensemble.
+
+    Sums over the pairs of bodies with at least one massive body, so the cost grows with the number of massive bodies
+    times the number of bodies, in chunks of rows so the memory use stays bounded for large constellations.
+    """
+    positions, masses = arrays.positions, arrays.masses
+    bodies = len(arrays)
+    massive = masses.reshape(-1, bodies).any(axis=0)
+    sources = np.flatnonzero(massive)
+    members = int(np.prod(masses.shape[:-1]))
+    chunk = max(CHUNK_ELEMENTS // (bodies * members), 1)
+    energy = np.zeros(masses.shape[:-1])
+    for first in range(0, len(sources), chunk):
+        rows = sources[first : first + chunk]
+        separations = positions[..., np.newaxis, :, :] - positions[..., rows, np.newaxis, :]
+        distances = np.sqrt(np.einsum("...ijk,...ijk->...ij", separations, separations))
+        distances[..., massive & (np.arange(bodies) <= rows[:, np.newaxis])] = np.inf  # Count every pair once
+        energy -= np.einsum("...i,...ij,...j->...", masses[..., rows], 1 / distances, masses)
+    return GRAVITATIONAL_CONSTANT * energy
+
+
+def momentum(arrays: BodyArrays) -> np.ndarray:
+    """Return the total momentum of the bodies, or of each member of the ensemble."""
+    return np.einsum("...i,...ij->...j", arrays.masses, arrays.velocities)
+
+
+def angular_momentum(arrays: BodyArrays) -> np.ndarray:
+    """Return the total angular momentum of the bodies about the origin, or of each member of the ensemble."""
+    return np.einsum("...i,...ij->...j", arrays.masses, np.cross(arrays.positions, arrays.velocities))
+
+
+class Diagnostics:
+    """Track the drift of the conserved quantities of a constellation relative to their initial values.
+
+    The errors are relative: the energy error to the initial energy, the angular momentum error to the length of the
+    initial angular momentum and the momentum error to the sum of the lengths of the initial momenta of the bodies,
+    since the total momentum is usually close to zero. Computing the potential energy is O(N²), so the quantities are
+    only sampled every so many calls of update. Optionally, every sample is written to a CSV file.
+    """
+
+    def __init__(self, arrays: BodyArrays, every: int = 1, csv_path: Path | None = None) -> None:
+        self.every = every  # Sample every this many updates
+        self.visible = False  # Whether the diagnostics are shown on screen
+        self.updates = 0
+        self.initial_energy = kinetic_energy(arrays) + potential_energy(arrays)
+        self.initial_momentum = momentum(arrays)
+        self.initial_angular_momentum = angular_momentum(arrays)
+        self._momentum_scale = np.einsum("...i,...i->...", arrays.masses, np.linalg.norm(arrays.velocities, axis=-1))
+        self.energy = self.initial_energy
+        self.energy_error = self.angular_momentum_error = self.momentum_error = np.zeros_like(self.initial_energy)
+        self.max_energy_error = self.max_angular_momentum_error = np.zeros_like(self.initial_energy)
+        self._csv_file = None
+        if csv_path:
+            self._csv_file = csv_path.open("w", newline="")
+            self._csv_writer = csv.writer(self._csv_file)
+            self._csv_writer.writerow(
+                [
+                    "time",
+                    "energy",
+                    "energy_error",
+                    *(f"momentum_{axis}" for axis in "xyz"),
+                    "momentum_error",
+                    *(f"angular_momentum_{axis}" for axis in "xyz"),
+                    "angular_momentum_error",
+                ]
+            )
+            atexit.register(self.close)
+            self.sample(arrays, 0.0)
+
+    def toggle(self) -> None:
+        """Show or hide the diagnostics."""
+        self.visible = not self.visible
+
+    def update(self, arrays: BodyArrays, time: float) -> None:
+        """Sample the conserved quantities if this is one of the updates to sample."""
+        self.updates += 1
+        if self.updates % self.every == 0:
+            self.sample(arrays, time)
+
+    def sample(self, arrays: BodyArrays, time: float) -> None:
+        """Calculate the conserved quantities and their errors."""
+        self.energy = kinetic_energy(arrays) + potential_energy(arrays)
+        total_momentum = momentum(arrays)
+        total_angular_momentum = angular_momentum(arrays)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.energy_error = np.abs((self.energy - self.initial_energy) / self.initial_energy)
+            self.momentum_error = np.linalg.norm(total_momentum - self.initial_momentum, axis=-1) / self._momentum_scale
+            self.angular_momentum_error = np.linalg.norm(
+                total_angular_momentum - self.initial_angular_momentum, axis=-1
+            ) / np.linalg.norm(self.initial_angular_momentum, axis=-1)
+        self.max_energy_error = np.fmax(self.max_energy_error, self.energy_error)
+        self.max_angular_momentum_error = np.fmax(self.max_angular_momentum_error, self.angular_momentum_error)
+        if self._csv_file:
+            self._csv_writer.writerow(
+                [
+                    time,
+                    f"{self.energy:.12e}",
+                    f"{self.energy_error:.3e}",
+                    *(f"{value:.12e}" for value in total_momentum),
+                    f"{self.momentum_error:.3e}",
+                    *(f"{value:.12e}" for value in total_angular_momentum),
+                    f"{self.angular_momentum_error:.3e}",
+                ]
+            )
+
+    def close(self) -> None:
+        """Close the CSV file."""
+        atexit.unregister(self.close)
+        if self._csv_file:
+            self._csv_file.close()
+            self._csv_file = None
@@ -0,0 +1,47 @@
+"""Vectorized gravity calculations."""
+
+from __future__ import annotations
+
+import numpy as np
+
+GRAVITATIONAL_CONSTANT = 6.67408 * 10 ** (-11)
+
+
+def pairwise_accelerations(positions: np.ndarray, masses: np.ndarray, targets: np.ndarray | None = None) -> np.ndarray:
+    """Return the gravitational acceleration of the target bodies (default all) due to all other bodies.
+
+    Only bodies with mass are sources, so test particles cost O(massive bodies) each instead of O(all bodies). Leading
+    dimensions, such as the members of an ensemble, are calculated independently in the same pass.
+    """
+    targets = np.arange(positions.shape[-2]) if targets is None else targets
+    sources: slice | np.ndarray
+    if masses.all():
+        sources, rows, columns = slice(None), np.arange(len(targets)), targets
+    else:
+        sources = np.flatnonzero(masses.reshape(-1, masses.shape[-1]).any(axis=0))
+        columns = np.searchsorted(sources, targets).clip(max=max(len(sources) - 1, 0))
+        rows = np.flatnonzero(sources[columns] == targets) if len(sources) else columns[:0]
+        columns = columns[rows]
+    # [i, j] = r_j - r_i for target i and source j
+    separations = positions[..., np.newaxis, sources, :] - positions[..., targets, np.newaxis, :]
+    distances_squared = np.einsum("...ijk,...ijk->...ij", separations, separations)
+    distances_squared[..., rows, columns] = np.inf  # A body exerts no force on itself
+    weights = masses[..., np.newaxis, sources] * distances_squared**-1.5
+    return GRAVITATIONAL_CONSTANT * np.einsum("...ijk,...ij->...ik", separations, weights)
+
+
+class PairwiseGravity:
+    """Calculate the exact gravitational accelerations by summing over all pairs of bodies."""
+
+    name = "pairwise"
+
+    def accelerations(self, positions: np.ndarray, masses: np.ndarray, targets: np.ndarray | None = None) -> np.ndarray:
+        """Return the gravitational acceleration of the target bodies (default all) due to all other bodies."""
+        return pairwise_accelerations(positions, masses, targets)
+
+    def state(self) -> dict[str, np.ndarray]:
+        """Return the state kept between steps, to save in a checkpoint: none."""
+        return {}
+
+    def load_state(self, state: dict[str, np.ndarray]) -> None:
+        """Restore the state kept between steps from a checkpoint."""
@@ -0,0 +1,196 @@
+"""Hierarchical subsystems: satellites that are integrated around their parent body in a local frame."""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+from .arrays import BodyArrays
+from .gravity import GRAVITATIONAL_CONSTANT
+from .integrators import Gravity, Integrator
+
+
+def mass_weighted_mean(values: np.ndarray, masses: np.ndarray) -> np.ndarray:
+    """Return the mean of the (..., bodies, 3) values weighted by the masses of the bodies."""
+    return np.einsum("...i,...ij->...j", masses, values) / masses.sum(axis=-1)[..., np.newaxis]
+
+
+def subsystem_accelerations(positions: np.ndarray, masses: np.ndarray, excluded: np.ndarray) -> np.ndarray:
+    """Return the gravitational acceleration of the (..., systems, members, 3) bodies due to their own subsystem.
+
+    The excluded pairs of members, such as a member with itself or with the padding of a subsystem, are infinite in
+    the (systems, members, members) excluded array and zero otherwise.
+    """
+    # [i, j] = r_j - r_i
+    separations = positions[..., np.newaxis, :, :] - positions[..., :, np.newaxis, :]
+    weights = np.einsum("...ijk,...ijk->...ij", separations, separations)
+    weights += excluded
+    weights **= -1.5
+    weights *= masses[..., np.newaxis, :]
+    return GRAVITATIONAL_CONSTANT * np.matmul(weights[..., np.newaxis, :], separations)[..., 0, :]
+
+
+def excluded_pairs(valid: np.ndarray) -> np.ndarray:
+    """Return the excluded pairs of subsystem_accelerations, for the (systems, members) array of which are members."""
+    pairs = valid[:, :, np.newaxis] & valid[:, np.newaxis, :] & ~np.eye(valid.shape[-1], dtype=bool)
+    return np.where(pairs, 0.0, np.inf)
+
+
+class HierarchicalIntegrator(Integrator):
+    """Integrate subsystems of a parent body and its satellites, such as a planet and its moons, in local frames.
+
+    The rest of the constellation sees a subsystem as one body at its center of mass with its total mass, and the
+    outer integrator advances these centers of mass together with the other bodies. The members of a subsystem move
+    relative to its center of mass under their mutual gravity, with leapfrog sub-steps of the time step. The gravity
+    of the rest of the constellation on the members, less its mean over the subsystem (the tide), is applied as a half
+    kick before and after the step. So the short periods of moons no longer limit the time step of the planets.
+
+    All subsystems are advanced together, as (systems, members, 3) arrays padded to the largest subsystem with
+    massless members, so a time step takes as many passes as the largest number of sub-steps of a subsystem.
+    """
+
+    def __init__(self, outer: Integrator, systems: np.ndarray, substeps: Sequence[int]) -> None:
+        if min(substeps, default=1) <= 0:
+            raise ValueError("The number of sub-steps of a subsystem must be positive")
+        self.outer = outer
+        self.name = outer.name
+        self.systems = systems  # Subsystem of each body, or -1 for bodies that are not in a subsystem
+        self.substeps = list(substeps)  # Number of sub-steps per time step of each subsystem
+        self.tides: np.ndarray | None = None  # Tidal accelerations of the members at the current positions
+        self._members: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None  # Cache of members()
+
+    def members(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the rows of the members of each subsystem, which of them are members and the excluded pairs.
+
+        The rows are a (systems, members) array, padded to the largest subsystem by repeating the last member.
+        """
+        if self._members is None:
+            systems = [np.flatnonzero(self.systems == system) for system in range(len(self.substeps))]
+            size = max(len(rows) for rows in systems)
+            padded = np.stack([np.pad(rows, (0, size - len(rows)), mode="edge") for rows in systems])
+            valid = np.arange(size) < np.array([len(rows) for rows in systems])[:, np.newaxis]
+            self._members = padded, valid, excluded_pairs(valid)
+        return self._members
+
+    def step(self, arrays: BodyArrays, gravity: Gravity, time_step: float) -> None:
+        """Advance all bodies by one time step."""
+        if not self.substeps:
+            self.outer.step(arrays, gravity, time_step)
+            return
+        rows, valid, excluded = self.members()
+        members = rows[valid]
+        if self.tides is None or self.tides.shape != arrays.positions[..., members, :].shape:
+            self.tides = self.tidal_accelerations(arrays, gravity, rows, valid, excluded)
+        arrays.velocities[..., members, :] += self.tides * (time_step / 2)
+
+        outer = self.collapse(arrays, rows, valid)
+        self.outer.step(outer, gravity, time_step)
+        free = np.flatnonzero(self.systems < 0)
+        arrays.positions[..., free, :] = outer.positions[..., : len(free), :]
+        arrays.velocities[..., free, :] = outer.velocities[..., : len(free), :]
+        arrays.accelerations[..., free, :] = outer.accelerations[..., : len(free), :]
+        relative = self.advance_systems(arrays, rows, valid, excluded, time_step, np.array(self.substeps))
+        for values, relative_values, outer_values in zip(
+            (arrays.positions, arrays.velocities, arrays.accelerations),
+            relative,
+            (outer.positions, outer.velocities, outer.accelerations),
+        ):
+            values[..., members, :] = (relative_values + outer_values[..., len(free) :, np.newaxis, :])[..., valid, :]
+
+        self.tides = self.tidal_accelerations(arrays, gravity, rows, valid, excluded)
+        arrays.velocities[..., members, :] += self.tides * (time_step / 2)
+
+    def collapse(self, arrays: BodyArrays, rows: np.ndarray, valid: np.ndarray) -> BodyArrays:
+        """Return the arrays of the bodies outside subsystems, followed by the center of mass of each subsystem."""
+        free = np.flatnonzero(self.systems < 0)
+        masses = np.where(valid, arrays.masses[..., rows], 0.0)
+
+        def outer_values(values: np.ndarray) -> np.ndarray:
+            return np.concatenate([values[..., free, :], mass_weighted_mean(values[..., rows, :], masses)], axis=-2)
+
+        outer = BodyArrays(
+            outer_values(arrays.positions),
+            outer_values(arrays.velocities),
+            np.concatenate([arrays.masses[..., free], masses.sum(axis=-1)], axis=-1),
+            np.concatenate([arrays.radii[..., free], arrays.radii[..., rows].max(axis=-1)], axis=-1),
+        )
+        outer.accelerations = outer_values(arrays.accelerations)
+        return outer
+
+    @staticmethod
+    def advance_systems(
+        arrays: BodyArrays,
+        rows: np.ndarray,
+        valid: np.ndarray,
+        excluded: np.ndarray,
+        time_step: float,
+        substeps: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Advance the members of the subsystems with kick-drift-kick leapfrog sub-steps under their mutual gravity.
+
+        Returns their (..., systems, members, 3) positions, velocities and accelerations relative to the center of mass
+        of their subsystem. Subsystems that have taken all their sub-steps wait for the others with empty sub-steps.
+        """
+        masses = np.where(valid, arrays.masses[..., rows], 0.0)
+        positions = arrays.positions[..., rows, :]
+        velocities = arrays.velocities[..., rows, :]
+        positions = positions - mass_weighted_mean(positions, masses)[..., np.newaxis, :]
+        velocities = velocities - mass_weighted_mean(velocities, masses)[..., np.newaxis, :]
+        # The sub-steps of each pass, zero for subsystems that have taken all theirs, as (passes, systems, 1, 1)
+        schedule = np.where(np.arange(substeps.max())[:, np.newaxis] < substeps, time_step / substeps, 0.0)
+        schedule = schedule[..., np.newaxis, np.newaxis]
+        halves = np.concatenate([schedule, np.zeros_like(schedule[:1])]) / 2
+        velocities += subsystem_accelerations(positions, masses, excluded) * halves[0]
+        # The closing half kick of each sub-step is combined with the opening half kick of the next one
+        for substep, kick in zip(schedule, halves[:-1] + halves[1:]):
+            positions += velocities * substep
+            accelerations = subsystem_accelerations(positions, masses, excluded)
+            velocities += accelerations * kick
+        return positions, velocities, accelerations
+
+    @staticmethod
+    def tidal_accelerations(
+        arrays: BodyArrays, gravity: Gravity, rows: np.ndarray, valid: np.ndarray, excluded: np.ndarray
+    ) -> np.ndarray:
+        """Return the tidal acceleration of the members of the subsystems, one subsystem after the other.
+
+        That is the acceleration due to the bodies outside their subsystem, less its mass-weighted mean over the
+        subsystem, which moves the center of mass instead.
+        """
+        masses = np.where(valid, arrays.masses[..., rows], 0.0)
+        accelerations = np.zeros(arrays.positions[..., rows, :].shape)
+        accelerations[..., valid, :] = gravity.accelerations(arrays.positions, arrays.masses, rows[valid])
+        accelerations -= subsystem_accelerations(arrays.positions[..., rows, :], masses, excluded)
+        accelerations -= mass_weighted_mean(accelerations, masses)[..., np.newaxis, :]
+        return accelerations[..., valid, :]
+
+    def remove_bodies(self, keep: np.ndarray) -> None:
+        """Forget the removed bodies, and dissolve the subsystems that have less than two members left."""
+        systems = self.systems[keep]
+        counts = np.bincount(systems[systems >= 0], minlength=len(self.substeps))
+        remaining = counts >= 2
+        renumbered = np.append(np.cumsum(remaining) - 1, -1)  # Index -1 keeps the bodies outside subsystems outside
+        self.systems = np.where(np.append(remaining, False)[systems], renumbered[systems], -1)
+        self.substeps = [substeps for substeps, kept in zip(self.substeps, remaining) if kept]
+        self.reset()
+
+    def reset(self) -> None:
+        self.outer.reset()
+        self.tides = None
+        self._members = None
+
+    def state(self) -> dict[str, np.ndarray]:
+        state = dict(systems=self.systems, substeps=np.array(self.substeps, dtype=np.int64))
+        if self.tides is not None:
+            state["tides"] = self.tides
+        return state | {f"outer_{key}": value for key, value in self.outer.state().items()}
+
+    def load_state(self, state: dict[str, np.ndarray]) -> None:
+        self.systems = state["systems"]
+        self.substeps = state["substeps"].tolist()
+        self.tides = state.get("tides")
+        self._members = None
+        self.outer.load_state(
+            {key.removeprefix("outer_"): value for key, value in state.items() if key.startswith("outer_")}
+        )
@@ -0,0 +1,309 @@
+"""Integrators that advance the body arrays in time."""
+
+from __future__ import annotations
+
+from abc import abstractmethod
+from typing import Protocol
+
+import numpy as np
+
+from .arrays import BodyArrays
+from .gravity import GRAVITATIONAL_CONSTANT
+
+
+class Gravity(Protocol):
+    def accelerations(self, positions: np.ndarray, masses: np.ndarray, targets: np.ndarray | None = None) -> np.ndarray:
+        """Return the gravitational acceleration of the target bodies (default all) due to all other bodies."""
+
+
+class Integrator:
+    """Class to represent integrators, selected by name with the "integrator" key of the constellation JSON file."""
+
+    name = ""
+
+    @abstractmethod
+    def step(self, arrays: BodyArrays, gravity: Gravity, time_step: float) -> None:
+        """Advance all bodies by one time step."""
+
+    def reset(self) -> None:
+        """Forget the state kept between steps, because the arrays were changed or replaced."""
+
+    def remove_bodies(self, keep: np.ndarray) -> None:
+        """Forget the removed bodies, after bodies merged; keep tells which of the bodies remain."""
+        self.reset()
+
+    def state(self) -> dict[str, np.ndarray]:
+        """Return the state kept between steps, to save in a checkpoint."""
+        return {}
+
+    def load_state(self, state: dict[str, np.ndarray]) -> None:
+        """Restore the state kept between steps from a checkpoint."""
+
+
+class VerletIntegrator(Integrator):
+    """Advance all bodies simultaneously with the velocity-Verlet-like update of the first versions of Orbit sim.
+
+    The positions are updated with the acceleration of the previous step, so the update is only first order accurate.
+    """
+
+    name = "verlet"
+
+    def step(self, arrays: BodyArrays, gravity: Gravity, time_step: float) -> None:
+        """Advance all bodies by one time step."""
+        accelerations = gravity.accelerations(arrays.positions, arrays.masses)
+        arrays.velocities += (time_step / 2) * (accelerations + arrays.accelerations)
+        arrays.positions += time_step * arrays.velocities + (time_step**2 / 2) * arrays.accelerations
+        arrays.accelerations = accelerations
+
+
+class LeapfrogIntegrator(Integrator):
+    """Advance all bodies simultaneously with kick-drift-kick leapfrog steps, second order accurate and symplectic.
+
+    Higher order integrators are compositions of leapfrog steps with the coefficients as fractions of the time step.
+    """
+
+    name = "leapfrog"
+    coefficients: tuple[float, ...] = (1.0,)
+
+    def __init__(self) -> None:
+        self.accelerations_valid = False  # Whether the accelerations of the arrays belong to the current positions
+
+    def step(self, arrays: BodyArrays, gravity: Gravity, time_step: float) -> None:
+        """Advance all bodies by one time step."""
+        if not self.accelerations_valid:
+            arrays.accelerations = gravity.accelerations(arrays.positions, arrays.masses)
+            self.accelerations_valid = True
+        for coefficient in self.coefficients:
+            substep = coefficient * time_step
+            arrays.velocities += arrays.accelerations * (substep / 2)
+            arrays.positions += arrays.velocities * substep
+            arrays.accelerations = gravity.accelerations(arrays.positions, arrays.masses)
+            arrays.velocities += arrays.accelerations * (substep / 2)
+
+    def reset(self) -> None:
+        self.accelerations_valid = False
+
+    def state(self) -> dict[str, np.ndarray]:
+        return dict(accelerations_valid=np.array(self.accelerations_valid))
+
+    def load_state(self, state: dict[str, np.ndarray]) -> None:
+        self.accelerations_valid = bool(state["accelerations_valid"])
+
+
+class Yoshida4Integrator(LeapfrogIntegrator):
+    """Fourth order symplectic integrator: a composition of three leapfrog steps (Yoshida, 1990)."""
+
+    name = "yoshida4"
+    coefficients = (
+        1 / (2 - 2 ** (1 / 3)),
+        -(2 ** (1 / 3)) / (2 - 2 ** (1 / 3)),
+        1 / (2 - 2 ** (1 / 3)),
+    )
+
+
+class Yoshida6Integrator(LeapfrogIntegrator):
+    """Sixth order symplectic integrator: a composition of seven leapfrog steps (Yoshida, 1990, solution A)."""
+
+    name = "yoshida6"
+    _outer = (0.784513610477560, 0.235573213359357, -1.17767998417887)
+    coefficients = (*_outer, 1 - 2 * sum(_outer), *reversed(_outer))
+
+
+class WisdomHolmanIntegrator(Integrator):
+    """Wisdom–Holman mapping in democratic heliocentric coordinates, for systems dominated by one central body.
+
+    The Keplerian motion of the other bodies around the most massive body is solved exactly, so only the much weaker
+    interactions between the other bodies limit the time step (Duncan, Levison and Lee, 1998).
+    """
+
+    name = "wisdom-holman"
+
+    def __init__(self) -> None:
+        self.interactions: np.ndarray | None = None  # Accelerations due to the interactions at the current positions
+
+    def step(self, arrays: BodyArrays, gravity: Gravity, time_step: float) -> None:
+        """Advance all bodies by one time step."""
+        masses = arrays.masses
+        star = int(np.argmax(masses.reshape(-1, len(arrays))[0]))
+        others = np.delete(np.arange(len(arrays)), star)
+        star_masses, other_masses = masses[..., star, np.newaxis], masses[..., others]
+        total_masses = masses.sum(axis=-1)[..., np.newaxis]
+        center_of_mass = arrays.center_of_mass()
+        center_of_mass_velocity = np.einsum("...i,...ij->...j", masses, arrays.velocities) / total_masses
+        # Heliocentric positions and barycentric velocities of the other bodies
+        positions = arrays.positions[..., others, :] - arrays.positions[..., star, np.newaxis, :]
+        velocities = arrays.velocities[..., others, :] - center_of_mass_velocity[..., np.newaxis, :]
+
+        if self.interactions is None or self.interactions.shape != positions.shape:
+            self.interactions = gravity.accelerations(positions, other_masses)
+        velocities += self.interactions * (time_step / 2)
+        positions += self.jump(velocities, other_masses, star_masses, time_step / 2)
+        positions, velocities = kepler_drift(positions, velocities, GRAVITATIONAL_CONSTANT * star_masses, time_step)
+        positions += self.jump(velocities, other_masses, star_masses, time_step / 2)
+        self.interactions = gravity.accelerations(positions, other_masses)
+        velocities += self.interactions * (time_step / 2)
+        center_of_mass += center_of_mass_velocity * time_step
+
+        star_position = center_of_mass - np.einsum("...i,...ij->...j", other_masses, positions) / total_masses
+        arrays.positions[..., star, :] = star_position
+        arrays.positions[..., others, :] = positions + star_position[..., np.newaxis, :]
+        arrays.velocities[..., others, :] = velocities + center_of_mass_velocity[..., np.newaxis, :]
+        arrays.velocities[..., star, :] = (
+            center_of_mass_velocity - np.einsum("...i,...ij->...j", other_masses, velocities) / star_masses
+        )
+
+    @staticmethod
+    def jump(velocities: np.ndarray, masses: np.ndarray, star_masses: np.ndarray, time_step: float) -> np.ndarray:
+        """Return the change of the heliocentric positions due to the momentum of the central body."""
+        momentum = np.einsum("...i,...ij->...j", masses, velocities)
+        return (momentum * (time_step / star_masses))[..., np.newaxis, :]
+
+    def reset(self) -> None:
+        self.interactions = None
+
+    def state(self) -> dict[str, np.ndarray]:
+        return {} if self.interactions is None else dict(interactions=self.interactions)
+
+    def load_state(self, state: dict[str, np.ndarray]) -> None:
+        self.interactions = state.get("interactions")
+
+
+def stumpff(z: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the Stumpff functions C(z) and S(z)."""
+    root = np.sqrt(np.abs(z))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        elliptic_c, elliptic_s = (1 - np.cos(root)) / z, (root - np.sin(root)) / root**3
+        hyperbolic_c, hyperbolic_s = (np.cosh(root) - 1) / -z, (np.sinh(root) - root) / root**3
+    series_c, series_s = 1 / 2 - z / 24 + z**2 / 720, 1 / 6 - z / 120 + z**2 / 5040
+    small = np.abs(z) < 1e-4
+    c = np.where(small, series_c, np.where(z > 0, elliptic_c, hyperbolic_c))
+    s = np.where(small, series_s, np.where(z > 0, elliptic_s, hyperbolic_s))
+    return c, s
+
+
+def kepler_drift(
+    positions: np.ndarray, velocities: np.ndarray, mu: np.ndarray, time_step: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """Advance bodies on Kepler orbits around a central mass with gravitational parameter mu.
+
+    Uses universal variables, so elliptic and hyperbolic orbits are handled alike. The universal anomaly is solved
+    with the Laguerre–Conway iteration, which converges for all orbits.
+    """
+    mu = mu[..., np.newaxis]
+    distance = np.linalg.norm(positions, axis=-1, keepdims=True)
+    radial_velocity = np.einsum("...j,...j->...", positions, velocities)[..., np.newaxis] / distance
+    alpha = 2 / distance - np.einsum("...j,...j->...", velocities, velocities)[..., np.newaxis] / mu
+    sqrt_mu = np.sqrt(mu)
+    sigma = distance * radial_velocity / sqrt_mu
+    anomaly = sqrt_mu * np.abs(alpha) * time_step
+    for _ in range(50):
+        z = alpha * anomaly**2
+        c, s = stumpff(z)
+        function = sigma * anomaly**2 * c + (1 - alpha * distance) * anomaly**3 * s + distance * anomaly
+        function -= sqrt_mu * time_step
+        derivative = sigma * anomaly * (1 - z * s) + (1 - alpha * distance) * anomaly**2 * c + distance
+        second_derivative = sigma * (1 - z * c) + (1 - alpha * distance) * anomaly * (1 - z * s)
+        root = np.sqrt(np.abs(16 * derivative**2 - 20 * function * second_derivative))
+        correction = 5 * function / (derivative + np.copysign(root, derivative))
+        anomaly -= correction
+        if np.all(np.abs(correction) <= 1e-14 * np.maximum(np.abs(anomaly), 1)):
+            break
+    z = alpha * anomaly**2
+    c, s = stumpff(z)
+    f = 1 - anomaly**2 / distance * c
+    g = time_step - anomaly**3 * s / sqrt_mu
+    new_positions = f * positions + g * velocities
+    new_distance = np.linalg.norm(new_positions, axis=-1, keepdims=True)
+    f_dot = sqrt_mu / (new_distance * distance) * (alpha * anomaly**3 * s - anomaly)
+    g_dot = 1 - anomaly**2 / new_distance * c
+    return new_positions, f_dot * positions + g_dot * velocities
+
+
+class BlockTimeStepIntegrator(Integrator):
+    """Advance the bodies with individual time steps from a power-of-two hierarchy (block time steps).
+
+    One step of the integrator is a block: the time step divided into 2**max_level ticks. Each body takes steps of
+    time_step / 2**level, where its level follows from the criterion time step = accuracy * |acceleration| / |jerk|,
+    so slow bodies take large steps and only the bodies that need it are sub-stepped. A body can only move to a
+    coarser level when its new step is aligned with the block. Each body step is a kick-drift-kick leapfrog step.
+    All bodies drift together, but the gravity is only calculated for the bodies at the end of their step.
+    """
+
+    name = "block"
+
+    def __init__(self, accuracy: float = 0.02, max_level: int = 10) -> None:
+        self.accuracy = accuracy
+        self.max_level = max_level
+        self.levels = np.empty(0, dtype=np.int64)
+        self.jerks = np.empty((0, 3))  # m/s^3
+
+    def reset(self) -> None:
+        self.levels = np.empty(0, dtype=np.int64)
+
+    def state(self) -> dict[str, np.ndarray]:
+        return dict(levels=self.levels, jerks=self.jerks)
+
+    def load_state(self, state: dict[str, np.ndarray]) -> None:
+        self.levels, self.jerks = state["levels"], state["jerks"]
+
+    def step(self, arrays: BodyArrays, gravity: Gravity, time_step: float) -> None:
+        """Advance all bodies by one block of the given time step."""
+        if arrays.ensemble_size is not None:
+            raise ValueError("Block time steps are not supported for ensembles")
+        if len(self.levels) != len(arrays):
+            self.initialize(arrays, gravity, time_step)
+        ticks = 2**self.max_level
+        tick = time_step / ticks
+        end_ticks = np.zeros(len(arrays), dtype=np.int64)  # Tick at which the current step of each body ends
+        now = 0
+        starting = np.arange(len(arrays))
+        while True:
+            self.start_steps(arrays, starting, now, end_ticks, time_step)
+            next_tick = int(end_ticks.min())
+            arrays.positions += arrays.velocities * ((next_tick - now) * tick)
+            now = next_tick
+            ending = np.flatnonzero(end_ticks == now)
+            step_sizes = (time_step / 2.0 ** self.levels[ending])[:, np.newaxis]
+            accelerations = gravity.accelerations(arrays.positions, arrays.masses, ending)
+            arrays.velocities[ending] += accelerations * (step_sizes / 2)
+            self.jerks[ending] = (accelerations - arrays.accelerations[ending]) / step_sizes
+            arrays.accelerations[ending] = accelerations
+            if now == ticks:
+                break
+            starting = ending
+
+    def initialize(self, arrays: BodyArrays, gravity: Gravity, time_step: float) -> None:
+        """Calculate the accelerations and estimate the jerks with a small trial drift of all bodies."""
+        arrays.accelerations = gravity.accelerations(arrays.positions, arrays.masses)
+        trial_step = time_step / 2**self.max_level
+        trial_positions = arrays.positions + arrays.velocities * trial_step
+        self.jerks = (gravity.accelerations(trial_positions, arrays.masses) - arrays.accelerations) / trial_step
+        self.levels = np.zeros(len(arrays), dtype=np.int64)
+
+    def start_steps(
+        self, arrays: BodyArrays, bodies: np.ndarray, now: int, end_ticks: np.ndarray, time_step: float
+    ) -> None:
+        """Choose the levels of the bodies that start a step and give them the opening half kick."""
+        accelerations = np.linalg.norm(arrays.accelerations[bodies], axis=1)
+        jerks = np.linalg.norm(self.jerks[bodies], axis=1)
+        with np.errstate(divide="ignore"):
+            wanted = np.ceil(np.log2(time_step * jerks / (self.accuracy * accelerations)))
+        levels = np.clip(np.nan_to_num(wanted, nan=0, posinf=self.max_level, neginf=0), 0, self.max_level)
+        levels = levels.astype(np.int64)
+        # A step can only end on a tick that is a multiple of its length, so a body may have to stay on a finer level
+        while np.any(misaligned := now % 2 ** (self.max_level - levels) != 0):
+            levels[misaligned] += 1
+        self.levels[bodies] = levels
+        end_ticks[bodies] = now + 2 ** (self.max_level - levels)
+        arrays.velocities[bodies] += arrays.accelerations[bodies] * (time_step / 2.0**levels / 2)[:, np.newaxis]
+
+
+INTEGRATOR_CLASSES: tuple[type[Integrator], ...] = (
+    VerletIntegrator,
+    LeapfrogIntegrator,
+    Yoshida4Integrator,
+    Yoshida6Integrator,
+    WisdomHolmanIntegrator,
+    BlockTimeStepIntegrator,
+)
+INTEGRATORS = {integrator.name: integrator for integrator in INTEGRATOR_CLASSES}
@@ -0,0 +1,162 @@
+"""Create models from constellation JSON files."""
+
+import json
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+from pygame.math import Vector3
+
+from .constellation import Constellation
+from .gravity import PairwiseGravity
+from .hierarchy import HierarchicalIntegrator
+from .integrators import INTEGRATORS, BlockTimeStepIntegrator, Integrator, VerletIntegrator
+from .physicalobject import InclinedPhysicalObjectModel, PhysicalObjectModel, TestParticleModel, elements_to_cartesian
+from .tables import read_body_table
+
+
+def load_constellation_module(module_name: str) -> dict:
+    """Load the constellation JSON file. The paths of its body tables are relative to the JSON file.
+
+    A body table is either a path or a dict with the path and options, such as "test_particles".
+    """
+    with open(module_name) as json_file:
+        constellation_module = json.load(json_file)
+    tables = [
+        table if isinstance(table, dict) else dict(path=table) for table in constellation_module.get("tables", [])
+    ]
+    constellation_module["tables"] = [
+        table | dict(path=str(Path(module_name).parent / table["path"])) for table in tables
+    ]
+    return constellation_module
+
+
+def create_body_models(constellation_module: dict) -> dict[str, PhysicalObjectModel]:
+    """Create the body models of the constellation, by name: first the bodies of the JSON file, then of the tables."""
+    body_models: dict[str, PhysicalObjectModel] = {}
+    for name, body in constellation_module["Constellation"].items():
+        aphelion = body.get("aphelion")
+        if body.get("test_particle"):
+            if aphelion:
+                position, velocity = elements_to_cartesian(aphelion, body["min_orbital_velocity"], body["inclination"])
+            else:
+                position, velocity = body["init_position"], body["init_velocity"]
+            body_models[name] = TestParticleModel(Vector3(position), Vector3(velocity), body["radius"])
+        elif aphelion:
+            body_models[name] = InclinedPhysicalObjectModel(
+                aphelion, body["min_orbital_velocity"], body["inclination"], body["radius"], body["mass"]
+            )
+        else:
+            body_models[name] = PhysicalObjectModel(
+                Vector3(body["init_position"]),
+                Vector3(body["init_velocity"]),
+                body["radius"],
+                body["mass"],
+            )
+    # Satellites are given relative to their parent, so move them by the initial state of all their ancestors
+    initial_states = {name: (body_model.position, body_model.velocity) for name, body_model in body_models.items()}
+    for name in constellation_module["Constellation"]:
+        for ancestor in ancestors(constellation_module, name):
+            body_models[name].position += initial_states[ancestor][0]
+            body_models[name].velocity += initial_states[ancestor][1]
+    for table in constellation_module.get("tables", []):
+        names, arrays = read_body_table(Path(table["path"]))
+        if duplicates := body_models.keys() & set(names):
+            raise ValueError(
+                f"{table['path']} has bodies with the names of other bodies: {', '.join(sorted(duplicates)[:5])}"
+            )
+        model_class: type[PhysicalObjectModel] = PhysicalObjectModel
+        if table.get("test_particles"):
+            arrays.masses[:] = 0.0
+            model_class = TestParticleModel
+        body_models.update((name, model_class.bound(arrays, index)) for index, name in enumerate(names))
+    return body_models
+
+
+def ancestors(constellation_module: dict, name: str) -> list[str]:
+    """Return the parent of a body of the JSON file, the parent of its parent and so on, up to a body without parent."""
+    bodies = constellation_module["Constellation"]
+    chain: list[str] = []
+    while parent := bodies[chain[-1] if chain else name].get("parent"):
+        if parent not in bodies:
+            raise ValueError(f"The parent of {chain[-1] if chain else name} is not a body: {parent}")
+        if parent == name or parent in chain:
+            raise ValueError(f"{name} is its own ancestor")
+        chain.append(parent)
+    return chain
+
+
+def create_integrator(constellation_module: dict) -> Integrator:
+    """Create the integrator of the constellation JSON file."""
+    name = constellation_module.get("integrator", VerletIntegrator.name)
+    if name == BlockTimeStepIntegrator.name:
+        return BlockTimeStepIntegrator(
+            constellation_module.get("accuracy", 0.02), constellation_module.get("max_level", 10)
+        )
+    if name not in INTEGRATORS:
+        raise ValueError(f"Unknown integrator: {name}")
+    return INTEGRATORS[name]()
+
+
+def create_hierarchical_integrator(constellation_module: dict, body_names: Sequence[str]) -> Integrator:
+    """Create the integrator of the constellation JSON file, in a hierarchical integrator if bodies have a parent.
+
+    Every body without a parent that has satellites forms a subsystem with all its descendants. The bodies are given by
+    name, in the order of the arrays.
+    """
+    integrator = create_integrator(constellation_module)
+    bodies = constellation_module["Constellation"]
+    roots = {name: chain[-1] for name in bodies if (chain := ancestors(constellation_module, name))}
+    if not roots:
+        return integrator
+    systems = {root: system for system, root in enumerate(dict.fromkeys(roots.values()))}
+    return HierarchicalIntegrator(
+        integrator,
+        np.array([systems.get(roots.get(name, name), -1) for name in body_names], dtype=np.int64),
+        [bodies[root].get("substeps", 10) for root in systems],
+    )
+
+
+def create_constellation(constellation_module: dict, body_models: dict[str, PhysicalObjectModel]) -> Constellation:
+    """Create the constellation model of the bodies with the gravity solver of the constellation JSON file."""
+    return Constellation(
+        list(body_models.values()),
+        constellation_module.get("gravity", PairwiseGravity.name),
+        constellation_module.get("theta", 0.5),
+        create_hierarchical_integrator(constellation_module, list(body_models)),
+        constellation_module.get("collisions", False),
+    )
+
+
+def create_ensemble(
+    constellation_modules: Sequence[dict], body_models: Sequence[dict[str, PhysicalObjectModel]]
+) -> Constellation:
+    """Create an ensemble of variants of a constellation.
+
+    The variants must have the same bodies and the same settings, such as the time step and the integrator, as they
+    are advanced together. Bodies of an ensemble don't merge when they collide, as the members must keep the same
+    number of bodies.
+    """
+    settings = ensemble_settings(constellation_modules[0])
+    for module in constellation_modules[1:]:
+        if differing := sorted({key for key, _ in ensemble_settings(module).items() ^ settings.items()}):
+            raise ValueError(f"The variants of an ensemble must have the same settings: {', '.join(differing)}")
+    if any(list(models) != list(body_models[0]) for models in body_models):
+        raise ValueError("The variants of an ensemble must have the same bodies")
+    return Constellation.ensemble(
+        [list(models.values()) for models in body_models],
+        constellation_modules[0].get("gravity", PairwiseGravity.name),
+        constellation_modules[0].get("theta", 0.5),
+        create_hierarchical_integrator(constellation_modules[0], list(body_models[0])),
+    )
+
+
+def ensemble_settings(constellation_module: dict) -> dict:
+    """Return the settings that the variants of an ensemble must share, as JSON text.
+
+    These are the top-level settings of the constellation JSON file and the parents and sub-steps of its bodies.
+    """
+    settings = {key: json.dumps(value) for key, value in constellation_module.items() if key != "Constellation"}
+    for name, body in constellation_module["Constellation"].items():
+        settings |= {f"{name}.{key}": json.dumps(body.get(key)) for key in ("parent", "substeps")}
+    return settings
@@ -0,0 +1,119 @@
+"""Integrate a constellation ahead of the shown time in a background process, with an index of keyframes."""
+
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import queue
+from multiprocessing.synchronize import Event
+
+import numpy as np
+
+from .checkpoint import checkpoint_state, restore_state
+from .constellation import Constellation
+from .loader import create_body_models, create_constellation, load_constellation_module
+
+MAX_KEYFRAME_BYTES = 2**30  # Memory of the keyframes after which the worker stops looking ahead
+
+
+class LookAhead:
+    """Show any time step that the look-ahead worker has reached, forwards, backwards or by jumping.
+
+    A worker process integrates the constellation as fast as it can and sends a keyframe with the complete state every
+    keyframe_every time steps. To show a time step, the last keyframe before it is restored into a constellation of
+    the viewer, which is then integrated up to the time step, unless it is already between the two. So showing any
+    time step costs at most keyframe_every time steps, and the time steps of keyframes are shown without integrating.
+    The frames are the time steps, so the look-ahead can be played and scrubbed like a replay.
+
+    The given constellation of the viewer is not integrated: its positions and velocities are replaced by those of the
+    shown time step, with merged bodies at the position of the body they merged into.
+    """
+
+    def __init__(self, module_name: str, constellation: Constellation, keyframe_every: int) -> None:
+        if keyframe_every <= 0:
+            raise ValueError("The number of time steps between keyframes must be positive")
+        self.constellation = constellation
+        self.keyframe_every = keyframe_every
+        constellation_module = load_constellation_module(module_name)
+        self.time_step: float = constellation_module["time_step"]
+        self.body_models = create_body_models(constellation_module)
+        self.cursor = create_constellation(constellation_module, self.body_models)
+        self.cursor_frame = 0  # Time step of the cursor constellation
+        self.keyframes = [checkpoint_state(self.cursor, self.body_models, 0.0)]
+        context = multiprocessing.get_context("spawn")
+        self.received: multiprocessing.Queue = context.Queue()
+        self.running = context.Event()
+        self.running.set()
+        self.process = context.Process(
+            target=run_look_ahead,
+            args=(module_name, self.received, self.running, keyframe_every),
+            daemon=True,
+        )
+        self.process.start()
+        self.frame = 0
+        atexit.register(self.close)
+
+    def __len__(self) -> int:
+        """Return the number of time steps that can be shown, up to the last keyframe."""
+        return (len(self.keyframes) - 1) * self.keyframe_every + 1
+
+    @property
+    def time(self) -> float:
+        """Return the time of the shown time step."""
+        return self.frame * self.time_step
+
+    def receive(self) -> None:
+        """Add the keyframes that the worker has sent since the last call to the index."""
+        try:
+            while True:
+                self.keyframes.append(self.received.get_nowait())
+        except queue.Empty:
+            pass
+
+    def seek(self, frame: int) -> None:
+        """Show the given time step, limited to the time steps the worker has reached."""
+        self.receive()
+        self.frame = min(max(frame, 0), len(self) - 1)
+        keyframe = self.frame // self.keyframe_every
+        if not keyframe * self.keyframe_every <= self.cursor_frame <= self.frame:
+            restore_state(self.keyframes[keyframe], self.cursor, self.body_models)
+            self.cursor_frame = keyframe * self.keyframe_every
+        self.cursor.advance(self.frame - self.cursor_frame, self.time_step)
+        self.cursor.pop_merged()
+        self.cursor_frame = self.frame
+        arrays, rows = self.constellation.arrays, self.cursor.rows
+        arrays.positions[:] = self.cursor.arrays.positions[..., rows, :]
+        arrays.velocities[:] = self.cursor.arrays.velocities[..., rows, :]
+        self.constellation.center_of_mass.update_position(arrays)
+
+    def advance(self, frames: int) -> None:
+        """Go forward, or backward if the number of time steps is negative."""
+        self.seek(self.frame + frames)
+
+    def close(self) -> None:
+        """Stop the worker process."""
+        atexit.unregister(self.close)
+        self.running.clear()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+def run_look_ahead(module_name: str, keyframes: multiprocessing.Queue, running: Event, keyframe_every: int) -> None:
+    """Integrate the constellation and send its state every keyframe_every time steps, until stopped.
+
+    The worker also stops when the keyframes would take more than MAX_KEYFRAME_BYTES of memory.
+    """
+    keyframes.cancel_join_thread()  # Exit without waiting for the viewer to take the keyframes
+    constellation_module = load_constellation_module(module_name)
+    body_models = create_body_models(constellation_module)
+    constellation = create_constellation(constellation_module, body_models)
+    time_step = constellation_module["time_step"]
+    frame = keyframe_bytes = 0
+    while running.is_set() and keyframe_bytes < MAX_KEYFRAME_BYTES:
+        constellation.advance(keyframe_every, time_step)
+        constellation.pop_merged()
+        frame += keyframe_every
+        keyframe = checkpoint_state(constellation, body_models, frame * time_step)
+        keyframe_bytes += sum(np.asarray(value).nbytes for value in keyframe.values())
+        keyframes.put(keyframe)
@@ -2,16 +2,17 @@
 
 from __future__ import annotations
 
-from functools import cache
-from typing import Sequence
 import math
 
+import numpy as np
 from pygame.math import Vector3
 
+from .arrays import BodyArrays
+
 
 class PhysicalObjectModel:
-    gravitational_constant = 6.67408 * 10 ** (-11)
-    force_cache: dict[tuple[PhysicalObjectModel, PhysicalObjectModel], Vector3] = dict()
+    """Thin view onto one row of the body arrays that hold the state of a constellation."""
+
     null_vector = Vector3(0, 0, 0)
 
     def __init__(
@@ -21,47 +22,66 @@ class PhysicalObjectModel:
         radius: float,
         mass: float,
     ) -> None:
-        self.position = initial_position
-        self.velocity = initial_velocity
-        self.acceleration = self.null_vector
-        self.radius = radius  # m
-        self.mass = mass  # kg
-        self.id = id(self)
-
-    def net_force(self, bodies: Sequence[PhysicalObjectModel]) -> Vector3:
-        """Calculate the net force on the body."""
-        return sum((self.two_body_force(body) for body in bodies), start=self.null_vector)
-
-    def two_body_force(self, other_body: PhysicalObjectModel) -> Vector3:
-        """Return the force between self and other body, from the cache or calculated."""
-        if self == other_body:
-            return self.null_vector
-        key = (self, other_body) if self.id < other_body.id else (other_body, self)
-        if key in self.force_cache:
-            force = -self.force_cache[key]  # Reverse the force direction
-            del self.force_cache[key]  # We need the cached force only once
-        else:
-            self.force_cache[key] = force = self.calculate_two_body_force(other_body)
-        return force
-
-    def calculate_two_body_force(self, other_body: PhysicalObjectModel) -> Vector3:
-        """Calculate the force between self and other body."""
-        vector = other_body.position - self.position
-        distance = vector.length()
-        force_direction = vector.normalize()
-        return force_direction * self.mass_product(other_body) / (distance**2)
-
-    @cache
-    def mass_product(self, other_body: PhysicalObjectModel) -> float:
-        """Return the product of the masses and the gravitational constant."""
-        return self.gravitational_constant * self.mass * other_body.mass
-
-    def update_position(self, bodies: Sequence[PhysicalObjectModel], time_step: float) -> None:
-        """Update the position of the body."""
-        acceleration = self.net_force(bodies) / self.mass
-        self.velocity += time_step * ((acceleration + self.acceleration) / 2)
-        self.position += time_step * self.velocity + (time_step**2 / 2) * self.acceleration
-        self.acceleration = acceleration
+        # Until the body is added to a constellation, it owns arrays with a single row
+        self.arrays = BodyArrays(
+            np.array([tuple(initial_position)]),
+            np.array([tuple(initial_velocity)]),
+            np.array([mass]),
+            np.array([radius]),
+        )
+        self.index: int | tuple[int, int] = 0
+
+    @classmethod
+    def bound(cls, arrays: BodyArrays, index: int) -> PhysicalObjectModel:
+        """Return a body that is a view onto a row of existing arrays, without allocating arrays of its own."""
+        body_model = cls.__new__(cls)
+        body_model.bind(arrays, index)
+        return body_model
+
+    def bind(self, arrays: BodyArrays, index: int | tuple[int, int]) -> None:
+        """Make the body a view onto the given row of the arrays, or (member, row) of ensemble arrays."""
+        self.arrays = arrays
+        self.index = index
+
+    @property
+    def position(self) -> Vector3:
+        return Vector3(*self.arrays.positions[self.index])  # m
+
+    @position.setter
+    def position(self, position: Vector3) -> None:
+        self.arrays.positions[self.index] = tuple(position)
+
+    @property
+    def velocity(self) -> Vector3:
+        return Vector3(*self.arrays.velocities[self.index])  # m/s
+
+    @velocity.setter
+    def velocity(self, velocity: Vector3) -> None:
+        self.arrays.velocities[self.index] = tuple(velocity)
+
+    @property
+    def acceleration(self) -> Vector3:
+        return Vector3(*self.arrays.accelerations[self.index])  # m/s^2
+
+    @property
+    def mass(self) -> float:
+        return float(self.arrays.masses[self.index])  # kg
+
+    @property
+    def radius(self) -> float:
+        return float(self.arrays.radii[self.index])  # m
+
+
+class TestParticleModel(PhysicalObjectModel):
+    """A body of negligible mass, such as an asteroid, a ring particle or a spacecraft.
+
+    It feels the gravity of the massive bodies but exerts none: its mass in the body arrays is zero, so the gravity
+    solvers leave it out as a source. The pairwise sum only runs over the massive bodies and the Barnes–Hut tree only
+    holds them, so the cost of each particle depends on the number of massive bodies only.
+    """
+
+    def __init__(self, initial_position: Vector3, initial_velocity: Vector3, radius: float) -> None:
+        super().__init__(initial_position, initial_velocity, radius, 0.0)
 
 
 class InclinedPhysicalObjectModel(PhysicalObjectModel):
@@ -0,0 +1,139 @@
+"""Integrate a constellation in a separate process that publishes its positions into shared memory."""
+
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import time as wall_time
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.synchronize import Lock
+
+import numpy as np
+
+from .barneshut import BarnesHutGravity
+from .constellation import Constellation
+from .gravity import PairwiseGravity
+from .loader import create_body_models, create_constellation, load_constellation_module
+
+GRAVITY_SOLVERS = (PairwiseGravity.name, BarnesHutGravity.name)
+
+
+class SharedState:
+    """A ring of position snapshots and the control fields of the physics process, in one shared memory block.
+
+    The physics process writes each snapshot to a slot that is neither the latest nor the one being read, and only
+    then publishes it as the latest, so the viewer can read the positions in place without them changing underneath.
+    """
+
+    SLOTS = 3
+
+    def __init__(self, bodies: int, name: str | None = None) -> None:
+        self.dtype = np.dtype(
+            [
+                ("latest", np.int64),  # Slot of the latest snapshot
+                ("reading", np.int64),  # Slot the viewer is reading
+                ("running", np.int64),
+                ("calculations", np.int64),  # Time steps per frame
+                ("gravity", np.int64),  # Index of the gravity solver in GRAVITY_SOLVERS
+                ("times", np.float64, (self.SLOTS,)),  # s, elapsed simulated time of each snapshot
+                ("positions", np.float64, (self.SLOTS, bodies, 3)),  # m
+            ]
+        )
+        self.memory = SharedMemory(name, create=name is None, size=self.dtype.itemsize)
+        self.fields: np.ndarray = np.ndarray((), self.dtype, buffer=self.memory.buf)
+
+    def close(self) -> None:
+        """Release the shared memory of this process."""
+        del self.fields
+        self.memory.close()
+
+
+class PhysicsProcess:
+    """Run the integrator of a constellation in a separate process, at the speed set by the viewer.
+
+    The given constellation of the viewer is not integrated, its positions are replaced by the latest snapshot of the
+    physics process on every update.
+    """
+
+    def __init__(self, module_name: str, constellation: Constellation, frame_rate: float) -> None:
+        self.constellation = constellation
+        self.shared = SharedState(len(constellation.arrays))
+        fields = self.shared.fields
+        fields["positions"][:] = constellation.arrays.positions
+        fields["running"] = 1
+        fields["gravity"] = GRAVITY_SOLVERS.index(constellation.gravity.name)
+        context = multiprocessing.get_context("spawn")
+        self.lock = context.Lock()
+        self.process = context.Process(
+            target=run_physics,
+            args=(module_name, self.shared.memory.name, len(constellation.arrays), self.lock, frame_rate),
+            daemon=True,
+        )
+        self.process.start()
+        atexit.register(self.close)
+
+    @property
+    def calculations(self) -> int:
+        return int(self.shared.fields["calculations"])
+
+    @calculations.setter
+    def calculations(self, calculations: int) -> None:
+        self.shared.fields["calculations"] = calculations
+
+    def update(self) -> float:
+        """Show the latest snapshot and return its elapsed simulated time."""
+        fields = self.shared.fields
+        with self.lock:
+            slot = int(fields["latest"])
+            fields["reading"] = slot
+        self.constellation.arrays.positions = fields["positions"][slot]
+        self.constellation.center_of_mass.update_position(self.constellation.arrays)
+        return float(fields["times"][slot])
+
+    def toggle_gravity(self) -> None:
+        """Switch the physics process between the exact pairwise and the approximate Barnes–Hut gravity solver."""
+        self.shared.fields["gravity"] = 1 - self.shared.fields["gravity"]
+
+    def close(self) -> None:
+        """Stop the physics process and free the shared memory."""
+        atexit.unregister(self.close)
+        self.shared.fields["running"] = 0
+        self.process.join(timeout=5)
+        self.constellation.arrays.positions = self.constellation.arrays.positions.copy()
+        self.shared.close()
+        self.shared.memory.unlink()
+
+
+def run_physics(module_name: str, memory_name: str, bodies: int, lock: Lock, frame_rate: float) -> None:
+    """Integrate the constellation and publish a snapshot after the time steps of every frame, until stopped.
+
+    The integration is paced to the frame rate of the viewer, so the number of calculations per frame sets the speed.
+    When the physics can't keep up, it runs as fast as it can.
+    """
+    constellation_module = load_constellation_module(module_name)
+    constellation = create_constellation(constellation_module, create_body_models(constellation_module))
+    time_step = constellation_module["time_step"]
+    shared = SharedState(bodies, memory_name)
+    fields = shared.fields
+    elapsed_time = 0.0
+    deadline = wall_time.perf_counter()
+    while fields["running"]:
+        gravity = GRAVITY_SOLVERS[int(fields["gravity"])]
+        if constellation.gravity.name != gravity:
+            constellation.set_gravity(gravity)
+        calculations = int(fields["calculations"])
+        constellation.advance(calculations, time_step)
+        elapsed_time += calculations * time_step
+        with lock:
+            slot = next(slot for slot in range(shared.SLOTS) if slot not in (fields["latest"], fields["reading"]))
+        fields["positions"][slot] = constellation.arrays.positions[constellation.rows]  # Merged bodies coincide
+        fields["times"][slot] = elapsed_time
+        with lock:
+            fields["latest"] = slot
+        deadline += 1 / frame_rate
+        delay = deadline - wall_time.perf_counter()
+        if delay > 0:
+            wall_time.sleep(delay)
+        else:
+            deadline = wall_time.perf_counter()
+    shared.close()
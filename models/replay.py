@@ -0,0 +1,49 @@
+"""Replay recorded trajectories."""
+
+from typing import Sequence
+
+from .constellation import Constellation
+from .trajectory import TrajectoryReader
+
+
+class Replay:
+    """Replay a recorded trajectory by copying its frames into the arrays of the constellation.
+
+    Frames are read lazily from the memory mapped trajectory file, one frame at a time.
+    """
+
+    def __init__(self, constellation: Constellation, names: Sequence[str], reader: TrajectoryReader) -> None:
+        if len(reader) == 0:
+            raise ValueError("The trajectory has no frames")
+        self.constellation = constellation
+        self.reader = reader
+        self.bodies = [reader.body(name) for name in names]
+        self.frame = 0
+        self.seek(0)
+
+    def __len__(self) -> int:
+        """Return the number of frames."""
+        return len(self.reader)
+
+    @property
+    def time(self) -> float:
+        """Return the time of the current frame."""
+        return float(self.reader.times[self.frame])
+
+    @property
+    def time_step(self) -> float:
+        """Return the time between two frames."""
+        times = self.reader.times
+        return float(times[1] - times[0]) if len(times) > 1 else self.reader.time_step
+
+    def seek(self, frame: int) -> None:
+        """Go to the given frame, limited to the recorded frames."""
+        self.frame = min(max(frame, 0), len(self.reader) - 1)
+        arrays = self.constellation.arrays
+        arrays.positions[:] = self.reader.positions[self.frame, self.bodies]
+        arrays.velocities[:] = self.reader.velocities[self.frame, self.bodies]
+        self.constellation.center_of_mass.update_position(arrays)
+
+    def advance(self, frames: int) -> None:
+        """Go forward, or backward if the number of frames is negative."""
+        self.seek(self.frame + frames)
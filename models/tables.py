@@ -0,0 +1,58 @@
+"""Read bulk body tables: catalogues of many minor bodies, in CSV or columnar .npz files.
+
+A table has the columns x, y, z (m), vx, vy, vz (m/s), mass (kg) and radius (m), and optionally name. Bodies without
+a name are named after the file and their row, for example "main_belt 12".
+"""
+
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+from .arrays import BodyArrays
+
+COLUMNS = ("x", "y", "z", "vx", "vy", "vz", "mass", "radius")
+CHUNK_ROWS = 65536  # Rows of a CSV file that are parsed at a time
+
+
+def read_body_table(path: Path) -> tuple[list[str], BodyArrays]:
+    """Return the names and the arrays of the bodies in the table."""
+    if path.suffix.lower() == ".npz":
+        names, values = read_npz_table(path)
+    else:
+        names, values = read_csv_table(path)
+    names = names or [f"{path.stem} {row}" for row in range(len(values))]
+    return names, BodyArrays(values[:, 0:3], values[:, 3:6], values[:, 6], values[:, 7])
+
+
+def read_npz_table(path: Path) -> tuple[list[str], np.ndarray]:
+    """Return the names, if any, and a (bodies, columns) array of the values of an .npz file, one array per column."""
+    with np.load(path) as columns:
+        missing = [column for column in COLUMNS if column not in columns]
+        if missing:
+            raise ValueError(f"{path} has no column {', '.join(missing)}")
+        names = columns["name"].astype(str).tolist() if "name" in columns else []
+        return names, np.column_stack([columns[column].astype(np.float64) for column in COLUMNS])
+
+
+def read_csv_table(path: Path) -> tuple[list[str], np.ndarray]:
+    """Return the names, if any, and a (bodies, columns) array of the values of a CSV file with a header.
+
+    The file is parsed in chunks of rows, so only one chunk of text is in memory at a time.
+    """
+    names: list[str] = []
+    chunks = []
+    with path.open() as csv_file:
+        header = [column.strip() for column in csv_file.readline().split(",")]
+        missing = [column for column in COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"{path} has no column {', '.join(missing)}")
+        columns = [header.index(column) for column in COLUMNS]
+        while lines := list(itertools.islice(csv_file, CHUNK_ROWS)):
+            if "name" in header:
+                rows = np.loadtxt(lines, delimiter=",", dtype=str, ndmin=2)
+                names.extend(name.strip() for name in rows[:, header.index("name")])
+                chunks.append(rows[:, columns].astype(np.float64))
+            else:
+                chunks.append(np.loadtxt(lines, delimiter=",", usecols=columns, ndmin=2))
+    return names, np.concatenate(chunks) if chunks else np.empty((0, len(COLUMNS)))
@@ -0,0 +1,111 @@
+"""Trajectory files.
+
+A trajectory file starts with a header: the magic bytes, the length of the JSON metadata as an unsigned 64 bits
+integer and the JSON metadata with the names and masses of the bodies and the time step. The metadata is padded, so
+that the frames start at a multiple of 64 bytes. The header is followed by fixed-size frames of float64 values: the
+time, the positions and the velocities of all bodies. Because the frames have a fixed size, the file can be memory
+mapped for random access to frame ranges or individual bodies without loading the file into memory.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+MAGIC = b"ORBTRAJ1"
+ALIGNMENT = 64
+CHUNK_SIZE = 4 * 1024 * 1024  # Bytes of frames that are buffered before they are written
+
+
+def frame_dtype(bodies: int) -> np.dtype:
+    """Return the dtype of one frame of a trajectory of the given number of bodies."""
+    return np.dtype([("time", "<f8"), ("positions", "<f8", (bodies, 3)), ("velocities", "<f8", (bodies, 3))])
+
+
+class TrajectoryWriter:
+    """Append frames with the time, positions and velocities of the bodies to a trajectory file, in chunks."""
+
+    def __init__(self, path: Path, names: Sequence[str], masses: np.ndarray, time_step: float) -> None:
+        metadata = json.dumps(dict(names=list(names), masses=masses.tolist(), time_step=time_step)).encode()
+        header_length = len(MAGIC) + 8 + len(metadata)
+        metadata += b" " * (-header_length % ALIGNMENT)
+        self.file = path.open("wb")
+        self.file.write(MAGIC + np.uint64(len(metadata)).tobytes() + metadata)
+        dtype = frame_dtype(len(names))
+        self.chunk = np.zeros(max(CHUNK_SIZE // dtype.itemsize, 1), dtype=dtype)
+        self.frames_in_chunk = 0
+        self.frames = 0
+
+    def write(self, time: float, positions: np.ndarray, velocities: np.ndarray) -> None:
+        """Append one frame. The frames are written to the file per chunk."""
+        frame = self.chunk[self.frames_in_chunk]
+        frame["time"] = time
+        frame["positions"] = positions
+        frame["velocities"] = velocities
+        self.frames_in_chunk += 1
+        self.frames += 1
+        if self.frames_in_chunk == len(self.chunk):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the frames in the current chunk to the file."""
+        self.file.write(self.chunk[: self.frames_in_chunk].tobytes())
+        self.file.flush()
+        self.frames_in_chunk = 0
+
+    def close(self) -> None:
+        """Write the remaining frames and close the file."""
+        self.flush()
+        self.file.close()
+
+    def __enter__(self) -> TrajectoryWriter:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class TrajectoryReader:
+    """Read a trajectory file through a memory map, so frames are only loaded from disk when accessed."""
+
+    def __init__(self, path: Path) -> None:
+        with path.open("rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a trajectory file")
+            metadata_length = int(np.frombuffer(file.read(8), dtype=np.uint64)[0])
+            metadata = json.loads(file.read(metadata_length))
+        self.names: list[str] = metadata["names"]
+        self.masses = np.array(metadata["masses"])
+        self.time_step: float = metadata["time_step"]
+        dtype = frame_dtype(len(self.names))
+        offset = len(MAGIC) + 8 + metadata_length
+        frames = (path.stat().st_size - offset) // dtype.itemsize  # Ignore a partially written last frame
+        self.frames = (
+            np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(frames,)) if frames else np.zeros(0, dtype)
+        )
+
+    def __len__(self) -> int:
+        """Return the number of frames."""
+        return len(self.frames)
+
+    @property
+    def times(self) -> np.ndarray:
+        """Return the times of the frames."""
+        return self.frames["time"]
+
+    @property
+    def positions(self) -> np.ndarray:
+        """Return the positions of all bodies in all frames, as a (frames, bodies, 3) array."""
+        return self.frames["positions"]
+
+    @property
+    def velocities(self) -> np.ndarray:
+        """Return the velocities of all bodies in all frames, as a (frames, bodies, 3) array."""
+        return self.frames["velocities"]
+
+    def body(self, name: str) -> int:
+        """Return the index of the body with the given name."""
+        return self.names.index(name)
@@ -1,48 +1,63 @@
 """Orbit sim main program."""
 
-import sys
+import argparse
+import time as wall_time
+import typing
 from pathlib import Path
-import json
 
+import numpy as np
 import pygame
 from pygame.locals import *
-from pygame.math import Vector3
 
+if typing.TYPE_CHECKING:
+    from pygame import SysFont
+else:
+    from pygame.font import SysFont
+
+from models.checkpoint import Checkpoint, save_checkpoint
 from models.constellation import Constellation
-from models.physicalobject import InclinedPhysicalObjectModel, PhysicalObjectModel
-from controllers.time import Time
+from models.diagnostics import Diagnostics
+from models.loader import create_body_models, create_constellation, load_constellation_module
+from models.lookahead import LookAhead
+from models.physicalobject import PhysicalObjectModel
+from models.physics_process import PhysicsProcess
+from models.replay import Replay
+from models.trajectory import TrajectoryReader, TrajectoryWriter
+from controllers.time import LookAheadTime, PhysicsTime, ReplayTime, Time
+from views.cloud import BodyCloudView
 from views.physicalobject import PhysicalObjectView
 from controllers.camera import Camera
+from controllers.profiler import Profiler
+from controllers.recorder import Recorder
 from controllers.event_handler import EventHandler
 from resources.image_type import images
 
+FRAME_RATE = 60  # Frames per second of the viewer when the physics runs in a separate process
+CLOUD_COLOUR = (190, 160, 120)  # Default colour of the bodies without a view of their own
 
-def orbit_sim(module_name):
-    with open(module_name) as json_file:
-        constellation_module = json.load(json_file)
-
-    window = pygame.display.set_mode(flags=pygame.RESIZABLE)
-    window.set_alpha(None)
-    pygame.display.set_caption("orbit simulator")
-    pygame.init()
-    font = pygame.font.SysFont("monospace", 15)
 
-    body_models = []
-    body_viewers = []
+def create_body_viewers(
+    constellation_module: dict,
+    body_models: dict[str, PhysicalObjectModel],
+    constellation_model: Constellation,
+    font: SysFont,
+) -> list[PhysicalObjectView]:
+    """Create the views of the center of mass and the bodies of the constellation that have a view of their own."""
+    body_viewers = [
+        PhysicalObjectView(
+            "Center of mass",
+            constellation_module["scale_factor"],
+            (255, 0, 0),
+            Path("resources/center_of_mass.png"),
+            font,
+            constellation_model.center_of_mass,
+            500,
+            label_bottom_right=False,
+        )
+    ]
     for name, body in constellation_module["Constellation"].items():
-        aphelion = body.get("aphelion")
-        if aphelion:
-            body_model = InclinedPhysicalObjectModel(
-                aphelion, body["min_orbital_velocity"], body["inclination"], body["radius"], body["mass"]
-            )
-        else:
-            body_model = PhysicalObjectModel(
-                Vector3(body["init_position"]),
-                Vector3(body["init_velocity"]),
-                body["radius"],
-                body["mass"],
-            )
-        body_models.append(body_model)
+        if not has_view(constellation_module, name, body_models[name]):
+            continue
         body_viewers.append(
             PhysicalObjectView(
                 name,
@@ -50,43 +65,248 @@ def orbit_sim(module_name):
                 body.get("colour"),
                 images[body["type"]],
                 font,
-                body_model,
+                body_models[name],
                 body.get("tail_length", 5000),
             )
         )
+    return body_viewers
 
-    constellation_model = Constellation(body_models)
 
-    body_viewers.insert(
-        0,
-        PhysicalObjectView(
-            "Center of mass",
-            constellation_module["scale_factor"],
-            (255, 0, 0),
-            Path("resources/center_of_mass.png"),
-            font,
-            constellation_model.center_of_mass,
-            500,
-            label_bottom_right=False,
-        ),
+def has_view(constellation_module: dict, name: str, body_model: PhysicalObjectModel) -> bool:
+    """Return whether the body has a view of its own: if it is not from a table and not lighter than the view mass."""
+    return name in constellation_module["Constellation"] and body_model.mass >= constellation_module.get("view_mass", 0)
+
+
+def create_cloud_view(
+    constellation_module: dict, body_models: dict[str, PhysicalObjectModel], constellation_model: Constellation
+) -> BodyCloudView | None:
+    """Create the view of the bodies without a view of their own, if there are any."""
+    bodies = [
+        index
+        for index, (name, body_model) in enumerate(body_models.items())
+        if not has_view(constellation_module, name, body_model)
+    ]
+    if not bodies:
+        return None
+    return BodyCloudView(
+        constellation_model, np.array(bodies), tuple(constellation_module.get("cloud_colour", CLOUD_COLOUR))
     )
 
+
+def orbit_sim(
+    module_name,
+    replay_path: Path | None = None,
+    separate_process: bool = False,
+    dirty_rects: bool = False,
+    recorder: Recorder | None = None,
+    profiler: Profiler | None = None,
+    diagnostics_every: int = 10,
+    checkpoint_path: Path | None = None,
+    checkpoint_every: float = 60.0,
+    resume_path: Path | None = None,
+    keyframe_every: int | None = None,
+):
+    constellation_module = load_constellation_module(module_name)
+
+    window = pygame.display.set_mode(flags=pygame.RESIZABLE)
+    window.set_alpha(None)
+    pygame.display.set_caption("orbit simulator")
+    pygame.init()
+    font = pygame.font.SysFont("monospace", 15)
+
+    body_models = create_body_models(constellation_module)
+    constellation_model = create_constellation(constellation_module, body_models)
+    body_viewers = create_body_viewers(constellation_module, body_models, constellation_model, font)
+    cloud = create_cloud_view(constellation_module, body_models, constellation_model)
+    checkpoint = Checkpoint(resume_path) if resume_path else None
+    if checkpoint:
+        checkpoint.restore(constellation_model, body_models)
+
     clock = pygame.time.Clock()
-    time = Time(constellation_module["time_step"])
-    camera = Camera(window, body_viewers, time)
-    event_handler = EventHandler(camera, time)
-    while True:
-        clock.tick()
+    replay: Replay | LookAhead | None = None
+    physics: PhysicsProcess | None = None
+    if replay_path:
+        replay = Replay(constellation_model, list(body_models), TrajectoryReader(replay_path))
+        time: Time = ReplayTime(replay)
+    elif separate_process:
+        physics = PhysicsProcess(module_name, constellation_model, FRAME_RATE)
+        time = PhysicsTime(physics, constellation_module["time_step"])
+    elif keyframe_every is not None:
+        replay = LookAhead(module_name, constellation_model, keyframe_every)
+        time = LookAheadTime(replay)
+    else:
+        time = Time(constellation_module["time_step"])
+        if checkpoint:
+            time.elapsed_time = checkpoint.elapsed_time
+    profiler = profiler or Profiler()
+
+    def create_diagnostics() -> Diagnostics:
+        return Diagnostics(constellation_model.arrays, diagnostics_every)
 
-        for _ in range(time.calculations):
-            event_handler.handle_events()
-            constellation_model.update_positions(time.time_step)
-        time.update()
+    # the viewer of a separate physics process only receives the positions, not the velocities
+    camera = Camera(
+        window, body_viewers, time, dirty_rects, recorder, profiler, None if physics else create_diagnostics, cloud
+    )
+    event_handler = EventHandler(camera, time, physics or constellation_model)
+    if checkpoint:
+        camera.remove_bodies(constellation_model.pop_merged())
+        if checkpoint.tails is not None:
+            camera.restore_tails(checkpoint.tails)
 
-        camera.update(time.elapsed_time)
+    def save() -> None:
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, constellation_model, body_models, time.elapsed_time, camera.tails())
 
-        pygame.display.update()
+    next_checkpoint = wall_time.monotonic() + checkpoint_every
+    try:
+        while True:
+            clock.tick(FRAME_RATE if physics else 0)
+
+            with profiler.phase("events"):
+                event_handler.handle_events()
+            with profiler.phase("physics"):
+                if replay is None and physics is None:
+                    constellation_model.advance(time.calculations, time.time_step)
+                    if merged := constellation_model.pop_merged():
+                        camera.remove_bodies(merged)
+                time.update()
+                if camera.diagnostics and camera.diagnostics.visible:
+                    camera.diagnostics.update(constellation_model.arrays, time.elapsed_time)
+
+            changed_rects = camera.update(time.elapsed_time)
+
+            with profiler.phase("display"):
+                if changed_rects is None:
+                    pygame.display.update()
+                else:
+                    pygame.display.update(changed_rects)
+            profiler.end_frame()
+
+            if checkpoint_path and wall_time.monotonic() >= next_checkpoint:
+                save()
+                next_checkpoint = wall_time.monotonic() + checkpoint_every
+    except SystemExit:
+        save()  # The user quit
+        raise
+
+
+def orbit_sim_headless(
+    module_name: str,
+    steps: int,
+    out: Path,
+    every: int,
+    diagnostics_path: Path | None = None,
+    checkpoint_path: Path | None = None,
+    checkpoint_every: float = 60.0,
+    resume_path: Path | None = None,
+) -> None:
+    """Integrate the constellation without a display and stream the positions and velocities every few steps.
+
+    Optionally, the energy, momentum and angular momentum are written to a CSV file at the same steps, and the state
+    is saved to a checkpoint every checkpoint_every seconds and at the end.
+    """
+    constellation_module = load_constellation_module(module_name)
+    body_models = create_body_models(constellation_module)
+    constellation_model = create_constellation(constellation_module, body_models)
+    start_time = 0.0
+    if resume_path:
+        checkpoint = Checkpoint(resume_path)
+        checkpoint.restore(constellation_model, body_models)
+        start_time = checkpoint.elapsed_time
+    arrays = constellation_model.arrays
+    time_step = constellation_module["time_step"]
+
+    diagnostics = Diagnostics(arrays, csv_path=diagnostics_path) if diagnostics_path else None
+    start = last_checkpoint = wall_time.perf_counter()
+    rows = constellation_model.rows
+    with TrajectoryWriter(out, list(body_models), arrays.masses[rows], time_step) as writer:
+        writer.write(start_time, arrays.positions[rows], arrays.velocities[rows])
+        for step in range(0, steps, every):
+            batch = min(every, steps - step)
+            constellation_model.advance(batch, time_step)
+            time = start_time + (step + batch) * time_step
+            # bodies that merged are written with the state of the body they merged into
+            rows = constellation_model.rows
+            writer.write(time, arrays.positions[rows], arrays.velocities[rows])
+            if diagnostics:
+                diagnostics.update(arrays, time)
+            if checkpoint_path and wall_time.perf_counter() >= last_checkpoint + checkpoint_every:
+                save_checkpoint(checkpoint_path, constellation_model, body_models, time)
+                last_checkpoint = wall_time.perf_counter()
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, constellation_model, body_models, start_time + steps * time_step)
+    seconds = wall_time.perf_counter() - start
+    print(f"{steps} steps in {seconds:.2f} s: {steps / seconds:.0f} steps/s, {writer.frames} frames written to {out}")
+    if diagnostics:
+        diagnostics.close()
+        print(
+            f"Maximum energy error {diagnostics.max_energy_error:.2e}, maximum angular momentum error "
+            f"{diagnostics.max_angular_momentum_error:.2e}, written to {diagnostics_path}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate the orbits of the bodies of a constellation.")
+    parser.add_argument("constellation", help="constellation JSON file")
+    parser.add_argument("--headless", action="store_true", help="integrate without a display")
+    parser.add_argument("--steps", type=int, default=10_000, help="number of time steps in headless mode")
+    parser.add_argument("--out", type=Path, default=Path("trajectory.orbit"), help="trajectory file in headless mode")
+    parser.add_argument("--every", type=int, default=100, help="time steps between written frames in headless mode")
+    parser.add_argument("--diagnostics", type=Path, help="CSV file with the conserved quantities in headless mode")
+    parser.add_argument("--diagnostics-every", type=int, default=10, help="frames between diagnostics samples (e key)")
+    parser.add_argument("--checkpoint", type=Path, help="checkpoint file to save the state to periodically and on exit")
+    parser.add_argument("--checkpoint-every", type=float, default=60.0, help="seconds between checkpoints")
+    parser.add_argument("--resume", type=Path, help="checkpoint file to resume from")
+    parser.add_argument("--replay", type=Path, help="trajectory file to play back instead of integrating")
+    parser.add_argument("--process", action="store_true", help="integrate in a separate process from the display")
+    parser.add_argument("--look-ahead", action="store_true", help="integrate ahead in the background to scrub time")
+    parser.add_argument("--keyframe-every", type=int, default=100, help="time steps between look-ahead keyframes")
+    parser.add_argument("--dirty-rects", action="store_true", help="only redraw the areas of the window that change")
+    parser.add_argument("--record", type=Path, default=Path("animated.gif"), help="GIF file or PNG directory (g key)")
+    parser.add_argument("--record-scale", type=float, default=0.5, help="downscale factor of recorded frames")
+    parser.add_argument("--record-every", type=int, default=1, help="record every this many frames")
+    parser.add_argument("--profile-csv", type=Path, help="CSV file to write the time of each phase of every frame to")
+    args = parser.parse_args()
+    if args.steps <= 0 or args.every <= 0:
+        parser.error("--steps and --every must be positive")
+    if args.diagnostics_every <= 0:
+        parser.error("--diagnostics-every must be positive")
+    if args.keyframe_every <= 0:
+        parser.error("--keyframe-every must be positive")
+    if args.record_scale <= 0 or args.record_every <= 0:
+        parser.error("--record-scale and --record-every must be positive")
+    if (args.checkpoint or args.resume) and (args.replay or args.process or args.look_ahead):
+        parser.error("checkpoints are not supported with --replay, --process or --look-ahead")
+    if args.look_ahead and (args.replay or args.process):
+        parser.error("--look-ahead is not supported with --replay or --process")
+    if args.headless:
+        orbit_sim_headless(
+            args.constellation,
+            args.steps,
+            args.out,
+            args.every,
+            args.diagnostics,
+            args.checkpoint,
+            args.checkpoint_every,
+            args.resume,
+        )
+    else:
+        recorder = Recorder(args.record, args.record_scale, args.record_every)
+        profiler = Profiler(csv_path=args.profile_csv)
+        orbit_sim(
+            args.constellation,
+            args.replay,
+            args.process,
+            args.dirty_rects,
+            recorder,
+            profiler,
+            args.diagnostics_every,
+            args.checkpoint,
+            args.checkpoint_every,
+            args.resume,
+            args.keyframe_every if args.look_ahead else None,
+        )
 
 
 if __name__ == "__main__":
-    orbit_sim(sys.argv[1])
+    main()
@@ -0,0 +1,231 @@
+"""Orbit sim parameter sweep: integrate many variants of a constellation in parallel, without a display."""
+
+import argparse
+import contextlib
+import copy
+import csv
+import itertools
+import os
+import time as wall_time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import numpy as np
+
+from models.diagnostics import Diagnostics
+from models.loader import create_body_models, create_ensemble, load_constellation_module
+from models.trajectory import TrajectoryWriter
+
+
+def parse_values(text: str) -> tuple[str, list[float]]:
+    """Parse a KEY=VALUE,VALUE,... command line argument."""
+    key, _, values = text.partition("=")
+    return key, [float(value) for value in values.split(",")]
+
+
+def create_variants(
+    grid: dict[str, list[float]],
+    distributions: dict[str, tuple[str, list[float]]],
+    samples: int,
+    seed: int | None,
+) -> list[dict[str, float]]:
+    """Return the parameter values of each variant: every grid point combined with a number of random draws."""
+    rng = np.random.default_rng(seed)
+    variants = []
+    for grid_values in itertools.product(*grid.values()):
+        for _ in range(samples if distributions else 1):
+            variant = dict(zip(grid, grid_values))
+            for key, (distribution, arguments) in distributions.items():
+                variant[key] = float(getattr(rng, distribution)(*arguments))
+            variants.append(variant)
+    return variants
+
+
+def apply_variant(constellation_module: dict, variant: dict[str, float]) -> dict:
+    """Return a copy of the constellation with the parameters of the variant.
+
+    Keys are either top-level settings, such as "time_step", or body parameters: "Earth.mass" or, for one
+    component of a vector, "Earth.init_velocity.1".
+    """
+    constellation_module = copy.deepcopy(constellation_module)
+    for key, value in variant.items():
+        if "." not in key:
+            constellation_module[key] = value
+            continue
+        name, parameter, *component = key.split(".")
+        body = constellation_module["Constellation"][name]
+        if component:
+            body[parameter][int(component[0])] = value
+        else:
+            body[parameter] = value
+    return constellation_module
+
+
+def run_batch(
+    constellation_module: dict, variants: list[dict[str, float]], steps: int, every: int, trajectories: list[Path]
+) -> list[dict]:
+    """Integrate a batch of variants together as one ensemble and return the summary metrics of each variant.
+
+    Runs in a worker process. If trajectory files are given, each variant is also written as a normal trajectory.
+    """
+    constellation_modules = [apply_variant(constellation_module, variant) for variant in variants]
+    body_models = [create_body_models(module) for module in constellation_modules]
+    constellation_model = create_ensemble(constellation_modules, body_models)
+    arrays = constellation_model.arrays
+    time_step = constellation_modules[0]["time_step"]
+    names = list(body_models[0])
+    upper = np.triu_indices(len(arrays), k=1)
+    max_distance, min_separation = np.zeros(len(variants)), np.full(len(variants), np.inf)
+    unstable_after = np.zeros(len(variants), dtype=int)  # Steps after which the positions became non-finite
+    diagnostics = Diagnostics(arrays)
+    start = wall_time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        writers = [
+            stack.enter_context(TrajectoryWriter(path, names, arrays.masses[member], time_step))
+            for member, path in enumerate(trajectories)
+        ]
+        for step in range(0, steps, every):
+            batch = min(every, steps - step)
+            constellation_model.advance(batch, time_step)
+            for member, writer in enumerate(writers):
+                writer.write((step + batch) * time_step, arrays.positions[member], arrays.velocities[member])
+            finite = np.isfinite(arrays.positions).all(axis=(1, 2))
+            unstable_after[~finite & (unstable_after == 0)] = step + batch
+            distances = np.linalg.norm(arrays.positions - arrays.center_of_mass()[:, np.newaxis], axis=-1)
+            max_distance = np.fmax(max_distance, distances.max(axis=-1))
+            separations = np.linalg.norm(arrays.positions[:, :, np.newaxis] - arrays.positions[:, np.newaxis], axis=-1)
+            min_separation = np.fmin(min_separation, separations[:, upper[0], upper[1]].min(axis=-1, initial=np.inf))
+            diagnostics.update(arrays, (step + batch) * time_step)
+    seconds = wall_time.perf_counter() - start
+    return [
+        dict(
+            status="failed" if unstable_after[member] else "ok",
+            error=f"Non-finite positions after {unstable_after[member]} steps" if unstable_after[member] else "",
+            seconds=seconds,
+            steps_per_second=steps / seconds,
+            max_distance=max_distance[member],
+            min_separation=min_separation[member],
+            energy_drift=diagnostics.max_energy_error[member],
+            angular_momentum_drift=diagnostics.max_angular_momentum_error[member],
+        )
+        for member in range(len(variants))
+    ]
+
+
+def ensemble_key(variant: dict[str, float]) -> tuple:
+    """Return the values of the variant that the members of an ensemble must share, of settings and sub-steps."""
+    return tuple((key, value) for key, value in variant.items() if "." not in key or key.split(".")[1] == "substeps")
+
+
+def run_sweep(
+    constellation_module: dict,
+    variants: list[dict[str, float]],
+    steps: int,
+    every: int,
+    workers: int,
+    batch_size: int,
+    trajectories: Path | None,
+) -> list[dict]:
+    """Run the variants in batches over a pool of worker processes and return one row of results per variant.
+
+    The variants of a batch are integrated together as one ensemble, so a batch only has variants with the same
+    settings. A batch that raises an exception is recorded as failed. When a worker process dies, the whole pool
+    breaks, so the batches that were unfinished at that moment are rerun, each in a pool of its own, to find the
+    culprit.
+    """
+    # Only variants with the same settings can be integrated together, so batches are cut from groups of those
+    groups: dict[tuple, list[int]] = {}
+    for index, variant in enumerate(variants):
+        groups.setdefault(ensemble_key(variant), []).append(index)
+    batches = [
+        group[first : first + batch_size] for group in groups.values() for first in range(0, len(group), batch_size)
+    ]
+    results: dict[int, dict] = {}
+
+    def submit(executor: ProcessPoolExecutor, batch: list[int]) -> Future:
+        paths = [trajectories / f"variant_{index}.orbit" for index in batch] if trajectories else []
+        return executor.submit(
+            run_batch, constellation_module, [variants[index] for index in batch], steps, every, paths
+        )
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {submit(executor, batch): batch for batch in batches}
+        unfinished = collect_results(futures, results, len(variants))
+    for first in range(0, len(unfinished), workers):
+        executors = [ProcessPoolExecutor(1) for _ in unfinished[first : first + workers]]
+        futures = {
+            submit(executor, batch): batch for executor, batch in zip(executors, unfinished[first : first + workers])
+        }
+        for batch in collect_results(futures, results, len(variants)):
+            for index in batch:
+                results[index] = dict(status="failed", error="worker process died")
+                print(f"variant {index + 1}/{len(variants)}: failed")
+        for executor in executors:
+            executor.shutdown()
+    return [dict(variant=index, **variants[index], **results[index]) for index in range(len(variants))]
+
+
+def collect_results(futures: dict[Future, list[int]], results: dict[int, dict], variants: int) -> list[list[int]]:
+    """Collect the results of the futures as they complete and return the batches whose worker pool broke."""
+    broken = []
+    for future in as_completed(futures):
+        batch = futures[future]
+        try:
+            results.update(zip(batch, future.result()))
+        except BrokenProcessPool:
+            broken.append(batch)
+            continue
+        except Exception as error:
+            results.update((index, dict(status="failed", error=repr(error))) for index in batch)
+        for index in batch:
+            print(f"variant {index + 1}/{variants}: {results[index]['status']}")
+    return broken
+
+
+def write_table(rows: list[dict], path: Path) -> None:
+    """Write the results to a CSV file."""
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    with path.open("w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Integrate variants of a constellation in parallel.")
+    parser.add_argument("constellation", help="base constellation JSON file")
+    parser.add_argument("--grid", action="append", default=[], metavar="KEY=V1,V2,...", help="grid of values")
+    parser.add_argument("--uniform", action="append", default=[], metavar="KEY=LOW,HIGH", help="uniform distribution")
+    parser.add_argument("--normal", action="append", default=[], metavar="KEY=MEAN,STD", help="normal distribution")
+    parser.add_argument("--samples", type=int, default=10, help="random draws per grid point")
+    parser.add_argument("--seed", type=int, help="seed of the random draws")
+    parser.add_argument("--steps", type=int, default=10_000, help="number of time steps per variant")
+    parser.add_argument("--every", type=int, default=100, help="time steps between metric samples")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--batch", type=int, default=1, help="number of variants integrated together per worker")
+    parser.add_argument("--out", type=Path, default=Path("sweep.csv"), help="CSV file with the results")
+    parser.add_argument("--trajectories", type=Path, help="directory to write the trajectory of each variant to")
+    args = parser.parse_args()
+    if args.steps <= 0 or args.every <= 0:
+        parser.error("--steps and --every must be positive")
+    if args.batch <= 0 or args.workers <= 0 or args.samples <= 0:
+        parser.error("--batch, --workers and --samples must be positive")
+
+    grid = dict(parse_values(text) for text in args.grid)
+    distributions = {key: ("uniform", values) for key, values in map(parse_values, args.uniform)}
+    distributions |= {key: ("normal", values) for key, values in map(parse_values, args.normal)}
+    variants = create_variants(grid, distributions, args.samples, args.seed)
+    if args.trajectories:
+        args.trajectories.mkdir(parents=True, exist_ok=True)
+    constellation_module = load_constellation_module(args.constellation)
+    rows = run_sweep(
+        constellation_module, variants, args.steps, args.every, args.workers, args.batch, args.trajectories
+    )
+    write_table(rows, args.out)
+    failed = sum(row["status"] != "ok" for row in rows)
+    print(f"{len(rows)} variants, {failed} failed, results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
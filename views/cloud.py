@@ -0,0 +1,28 @@
+"""View of the many small bodies that have no view of their own."""
+
+import numpy as np
+
+from models.constellation import Constellation
+
+from .draw import Points
+from .projection import Projection
+
+
+class BodyCloudView:
+    """Draw the bodies without a view of their own, such as the bodies of tables, together as single pixels.
+
+    The bodies are the indices of the initial bodies of the constellation, so bodies that merged are drawn at the
+    position of the body they merged into.
+    """
+
+    def __init__(self, constellation: Constellation, bodies: np.ndarray, colour: tuple[int, int, int]) -> None:
+        self.constellation = constellation
+        self.bodies = bodies
+        self.colour = colour
+
+    def drawable(self, projection: Projection, origin: np.ndarray, width: int, height: int) -> Points:
+        """Return the points of the bodies that are in the window."""
+        positions = self.constellation.arrays.positions[self.constellation.rows[self.bodies]]
+        screen_positions = projection.project(positions, origin)
+        x, y = screen_positions[:, 0], screen_positions[:, 1]
+        return Points(screen_positions[(0 <= x) & (x < width) & (0 <= y) & (y < height)], self.colour)
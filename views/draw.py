@@ -1,8 +1,10 @@
 from abc import abstractmethod
 from typing import Sequence
 
+import numpy as np
 import pygame
 from pygame.math import Vector2, Vector3
+from pygame.rect import Rect
 from pygame.surface import Surface
 
 
@@ -12,7 +14,6 @@ class Drawable:
     def __init__(self, screen_positions: Sequence[Vector3]) -> None:
         self.screen_positions = [Vector2(position.x, position.y) for position in screen_positions]
         self.z = screen_positions[0].z
-        self._hash_value = hash((self.screen_positions[0].x, self.screen_positions[0].y))
 
     def in_window(self, width: int, height: int) -> bool:
         """Return whether the drawable is visible."""
@@ -21,29 +22,46 @@ class Drawable:
                 return True
         return False
 
-    def __hash__(self) -> int:
-        return self._hash_value
-
-    def __eq__(self, other) -> bool:
-        return self.screen_positions[0] == other.screen_positions[0]
-
     @abstractmethod
-    def draw(self, window: Surface) -> None:
-        """Draw the drawable on the window."""
+    def draw(self, window: Surface) -> Rect:
+        """Draw the drawable on the window and return the area drawn."""
 
 
-class Line(Drawable):
-    """Class to represent a drawable line."""
+class Polyline(Drawable):
+    """Class to represent a drawable polyline: a series of connected line segments, drawn with one call."""
 
-    def __init__(self, screen_positions: Sequence[Vector3], colour: tuple[int, int, int]) -> None:
-        super().__init__(screen_positions)
+    def __init__(self, screen_positions: np.ndarray, colour: tuple[int, int, int]) -> None:
+        self.screen_positions = screen_positions[:, :2].tolist()
+        self.z = float(screen_positions[:, 2].mean())
         self.colour = colour
         self.width = 2
 
-    def draw(self, window: Surface, line=pygame.draw.line) -> None:
-        """Draw the drawable on the window."""
-        start_pos, end_pos = self.screen_positions
-        line(window, self.colour, start_pos=start_pos, end_pos=end_pos, width=self.width)
+    def in_window(self, width: int, height: int) -> bool:
+        """Return whether the drawable is visible. Polylines are clipped when they are created."""
+        return True
+
+    def draw(self, window: Surface) -> Rect:
+        """Draw the drawable on the window and return the area drawn."""
+        return pygame.draw.lines(window, self.colour, False, self.screen_positions, self.width)
+
+
+def polylines(
+    screen_positions: np.ndarray, colour: tuple[int, int, int], width: int, height: int, chunk_size: int = 64
+) -> list[Polyline]:
+    """Return the polylines that draw the visible segments of a series of connected screen positions.
+
+    A segment is visible if one of its ends is in the window. The polylines are split where the series leaves the
+    window and into chunks of segments, so each chunk can be depth sorted against the other drawables.
+    """
+    x, y = screen_positions[:, 0], screen_positions[:, 1]
+    inside = (0 < x) & (x < width) & (0 < y) & (y < height)
+    visible: np.ndarray = np.r_[False, inside[:-1] | inside[1:], False]
+    starts, ends = np.flatnonzero(visible[1:] & ~visible[:-1]), np.flatnonzero(visible[:-1] & ~visible[1:])
+    return [
+        Polyline(screen_positions[first : min(first + chunk_size, end) + 1], colour)
+        for start, end in zip(starts.tolist(), ends.tolist())
+        for first in range(start, end, chunk_size)
+    ]
 
 
 class Image(Drawable):
@@ -53,9 +71,9 @@ class Image(Drawable):
         super().__init__([screen_position])
         self.image = image
 
-    def draw(self, window: Surface) -> None:
-        """Draw the drawable on the window."""
-        window.blit(self.image, (self.screen_positions[0].x, self.screen_positions[0].y))
+    def draw(self, window: Surface) -> Rect:
+        """Draw the drawable on the window and return the area drawn."""
+        return window.blit(self.image, (self.screen_positions[0].x, self.screen_positions[0].y))
 
 
 class Label(Drawable):
@@ -65,6 +83,29 @@ class Label(Drawable):
         super().__init__([screen_position])
         self.label = label
 
-    def draw(self, window: Surface) -> None:
-        """Draw the drawable on the window."""
-        window.blit(self.label, (self.screen_positions[0].x, self.screen_positions[0].y))
+    def draw(self, window: Surface) -> Rect:
+        """Draw the drawable on the window and return the area drawn."""
+        return window.blit(self.label, (self.screen_positions[0].x, self.screen_positions[0].y))
+
+
+class Points(Drawable):
+    """Class to represent many single pixel points with the same colour, drawn at once behind the other drawables."""
+
+    def __init__(self, screen_positions: np.ndarray, colour: tuple[int, int, int]) -> None:
+        self.x, self.y = screen_positions[:, 0].astype(np.intp), screen_positions[:, 1].astype(np.intp)
+        self.z = np.inf
+        self.colour = colour
+
+    def in_window(self, width: int, height: int) -> bool:
+        """Return whether the drawable is visible. Points are clipped when they are created."""
+        return True
+
+    def draw(self, window: Surface) -> Rect:
+        """Draw the drawable on the window and return the area drawn."""
+        if len(self.x) == 0:
+            return Rect(0, 0, 0, 0)
+        pixels = pygame.surfarray.pixels2d(window)  # Locks the window until deleted
+        pixels[self.x, self.y] = window.map_rgb(self.colour)
+        del pixels
+        left, top = int(self.x.min()), int(self.y.min())
+        return Rect(left, top, int(self.x.max()) - left + 1, int(self.y.max()) - top + 1)
@@ -1,12 +1,12 @@
-import collections
 import functools
 import math
 import typing
 from pathlib import Path
-from typing import Sequence
 
+import numpy as np
 import pygame
 from pygame.math import Vector2, Vector3
+from pygame.surface import Surface
 
 if typing.TYPE_CHECKING:
     from pygame import SysFont
@@ -15,34 +15,11 @@ else:
 
 from models.physicalobject import PhysicalObjectModel
 
-from .draw import Drawable, Image, Label, Line
-from .ordered_set import OrderedSet
+from .draw import Drawable, Image, Label, polylines
+from .projection import History, decimate
 from .settings import ViewSettings
 
 
-def zoom(coordinates: Sequence[Vector3], scale_factor: float, zoom_level: float) -> list[Vector3]:
-    """Zoom the coordinates with a scale factor and a zoom level."""
-    return [coordinate * scale_factor * zoom_level for coordinate in coordinates]
-
-
-def rotate(coordinates: Sequence[Vector3], x_rotation: float, y_rotation: float) -> list[Vector3]:
-    return [coordinate.rotate_x(x_rotation).rotate_y(y_rotation) for coordinate in coordinates]
-
-
-def relative_coordinates(coordinates: Sequence[Vector3], origin: Sequence[Vector3]) -> list[Vector3]:
-    """Transform the coordinates into coordinates relative to the origin."""
-    return [coordinate - origin for coordinate, origin in zip(coordinates, origin)]
-
-
-def pan(coordinates: list[Vector3], offset: Vector2) -> list[Vector3]:
-    """Pan the coordinates with the given offset."""
-    return [coordinate + Vector3(offset.x, offset.y, 0) for coordinate in coordinates]
-
-
-def round_coordinates(coordinates: list[Vector3]) -> list[Vector3]:
-    return [Vector3(round(coordinate.x), round(coordinate.y), round(coordinate.x)) for coordinate in coordinates]
-
-
 class PhysicalObjectView:
     def __init__(
         self,
@@ -58,14 +35,12 @@ class PhysicalObjectView:
         self.name = name
         self.scale_factor = scale_factor
         self.body_model = body
-        self.originalImage = pygame.image.load(image).convert_alpha()
+        self.originalImage = load_image(image)
         self.colour = colour or pygame.transform.average_color(self.originalImage)
         self.label = font.render(f"{self.name}", True, (255, 255, 255))
         self.label_bottom_right = label_bottom_right
-        self.positions: collections.deque[Vector3] = collections.deque(maxlen=5000)
-        self._screen_positions: collections.deque[Vector3] = collections.deque(maxlen=tail_length)
-        self._tail_lines: OrderedSet[Line] = OrderedSet(maxlen=tail_length)
-        self._previous_settings = ViewSettings(self)
+        self.tail_length = tail_length
+        self._screen_positions = History(1, tail_length)
 
     def radius(self, zoom_level: float, scaled_radius: bool):
         if scaled_radius and self.name != "Center of mass":
@@ -73,10 +48,10 @@ class PhysicalObjectView:
         else:
             return math.log(zoom_level * 10)
 
-    def drawables(self, settings: ViewSettings) -> list[Drawable]:
-        """Return the drawables."""
+    def drawables(self, settings: ViewSettings, width: int, height: int) -> list[Drawable]:
+        """Return the drawables, with the tail clipped to the window."""
         radius = self.radius(settings.zoomLevel, settings.scaled_radius)
-        current_position = self._screen_positions[-1]
+        current_position = Vector3(*self._screen_positions.last(1)[0, 0])
         image_position = Vector3(current_position.x - radius, current_position.y - radius, current_position.z)
         drawables: list[Drawable] = [Image(image_position, self.scaled_image(radius))]
         if settings.labels:
@@ -87,11 +62,8 @@ class PhysicalObjectView:
             )
             drawables.append(Label(label_position, self.label))
         if settings.tail:
-            if len(self._tail_lines) == 0:
-                self._tail_lines.extend([Line((self._screen_positions[i], self._screen_positions[i+1]), self.colour) for i in range(len(self._screen_positions) - 1)])
-            else:
-                self._tail_lines.append(Line((self._screen_positions[-2], self._screen_positions[-1]), self.colour))
-            drawables.extend(self._tail_lines)
+            tail = decimate(self._screen_positions.last(self.tail_length)[0])
+            drawables.extend(polylines(tail, self.colour, width, height))
         return drawables
 
     @functools.lru_cache(maxsize=20)
@@ -99,30 +71,23 @@ class PhysicalObjectView:
         """Return the scaled image."""
         return pygame.transform.scale(self.originalImage, (radius * 2, radius * 2))
 
-    def update_position(self):
-        """Update the list of physical model object positions."""
-        self.positions.append(self.body_model.position.copy())
+    def clear_tail(self) -> None:
+        """Clear the screen positions of the body."""
+        self._screen_positions.clear()
 
-    def update_screen_positions(self, settings: ViewSettings) -> None:
-        """Calculate the screen positions relative to the body to track."""
-        if settings.tail and settings.tail_settings_changed(self._previous_settings):
-            # We're displaying the tail and settings that determine the tail have changed, so recalculate all positions
+    def update_screen_positions(self, screen_positions: np.ndarray, redraw_tail: bool) -> None:
+        """Add the screen positions of the newest positions, or replace all of them if the tail is redrawn."""
+        if redraw_tail:
             self._screen_positions.clear()
-            self._tail_lines.clear()
-            my_positions: Sequence[Vector3] = self.positions
-            bodyToTrack_positions: Sequence[Vector3] = settings.bodyToTrack.positions
-        else:
-            # We're not displaying the tail or the display parameters have not changed, so only calculate the new point
-            my_positions = [self.positions[-1]]
-            bodyToTrack_positions = [settings.bodyToTrack.positions[-1]]
-        positions = relative_coordinates(my_positions, bodyToTrack_positions)
-        positions = rotate(positions, settings.x_rotation, settings.y_rotation)
-        positions = zoom(positions, self.scale_factor, settings.zoomLevel)
-        positions = pan(positions, settings.offset)
-        positions = round_coordinates(positions)
-        self._screen_positions.extend(positions)
-        self._previous_settings = settings.copy()
+        self._screen_positions.extend(screen_positions[np.newaxis])
 
     def get_distance_pixels(self, position: Vector2) -> float:
         """Get the distance in pixels to the given coordinate."""
-        return (Vector2(self._screen_positions[-1].x, self._screen_positions[-1].y) - position).length()
+        x, y, _ = self._screen_positions.last(1)[0, 0]
+        return (Vector2(x, y) - position).length()
+
+
+@functools.lru_cache(maxsize=None)
+def load_image(path: Path) -> Surface:
+    """Return the image, which is only loaded from disk once, however many bodies use it."""
+    return pygame.image.load(path).convert_alpha()
@@ -0,0 +1,86 @@
+"""Projection of the position history of all bodies onto the screen."""
+
+import math
+
+import numpy as np
+
+from .settings import ViewSettings
+
+
+class History:
+    """Ring buffer with the positions of bodies during the last frames, as one (bodies, points, 3) array.
+
+    Each position is written twice, capacity points apart, so the last points are always one contiguous slice.
+    """
+
+    def __init__(self, bodies: int, capacity: int) -> None:
+        self.capacity = capacity
+        self._positions = np.empty((bodies, 2 * capacity, 3))
+        self._count = 0  # Number of points added since the last clear
+
+    def append(self, positions: np.ndarray) -> None:
+        """Add the current positions of all bodies, dropping the oldest positions if the buffer is full."""
+        self.extend(positions[:, np.newaxis])
+
+    def extend(self, positions: np.ndarray) -> None:
+        """Add a (bodies, points, 3) array of positions, dropping the oldest positions if the buffer is full."""
+        positions = positions[:, -self.capacity :]
+        slots = (self._count + np.arange(positions.shape[1])) % self.capacity
+        self._positions[:, slots] = self._positions[:, slots + self.capacity] = positions
+        self._count += positions.shape[1]
+
+    def select(self, bodies: np.ndarray) -> None:
+        """Keep only the positions of the given bodies."""
+        self._positions = self._positions[bodies]
+
+    def clear(self) -> None:
+        """Forget all positions."""
+        self._count = 0
+
+    def last(self, points: int) -> np.ndarray:
+        """Return a view of the last points of all bodies, oldest first."""
+        points = min(points, len(self))
+        end = self._count % self.capacity + self.capacity
+        return self._positions[:, end - points : end]
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+
+class Projection:
+    """Transform world coordinates into screen coordinates with one combined rotation, scale and offset."""
+
+    def __init__(self, settings: ViewSettings, scale_factor: float) -> None:
+        x_angle, y_angle = math.radians(settings.x_rotation), math.radians(settings.y_rotation)
+        x_rotation = np.array(
+            [[1, 0, 0], [0, math.cos(x_angle), -math.sin(x_angle)], [0, math.sin(x_angle), math.cos(x_angle)]]
+        )
+        y_rotation = np.array(
+            [[math.cos(y_angle), 0, math.sin(y_angle)], [0, 1, 0], [-math.sin(y_angle), 0, math.cos(y_angle)]]
+        )
+        # Transposed, because the coordinates are row vectors
+        self.matrix = (y_rotation @ x_rotation).T * scale_factor * settings.zoomLevel
+        self.offset = np.array([settings.offset.x, settings.offset.y, 0.0])
+
+    def project(self, positions: np.ndarray, origins: np.ndarray) -> np.ndarray:
+        """Return the screen coordinates of the positions relative to the origins, with x and y rounded to pixels.
+
+        The z coordinate is the depth, used to draw the nearest objects last.
+        """
+        screen_positions = (positions - origins) @ self.matrix + self.offset
+        screen_positions[..., :2] = np.rint(screen_positions[..., :2])
+        return screen_positions
+
+
+def decimate(screen_positions: np.ndarray, min_distance: float = 1.0) -> np.ndarray:
+    """Return the screen positions without the points that are less than min_distance pixels further along the path.
+
+    The first and last points are kept, so the number of points is at most the length of the path in pixels.
+    """
+    if len(screen_positions) <= 2:
+        return screen_positions
+    distances = np.linalg.norm(np.diff(screen_positions[:, :2], axis=0), axis=1)
+    steps = np.floor(np.cumsum(distances) / min_distance)
+    keep: np.ndarray = np.r_[True, np.diff(steps, prepend=0) > 0]
+    keep[-1] = True
+    return screen_positions[keep]
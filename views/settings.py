@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import typing
 
 from pygame.math import Vector2
@@ -15,7 +15,7 @@ class ViewSettings:
 
     bodyToTrack: PhysicalObjectView
     zoomLevel: float = 1.0
-    offset: Vector2 = Vector2(0, 0)
+    offset: Vector2 = field(default_factory=lambda: Vector2(0, 0))
     x_rotation: float = 0.0
     y_rotation: float = 0.0
     scaled_radius: bool = False